@@ -0,0 +1,167 @@
+# backend/admission.py
+"""
+Admission control for LLM-bound work.
+
+At most ``limit`` LLM calls run at once. Further requests wait in a bounded
+queue. When the queue is full, or a request has waited ``max_wait`` seconds,
+it is rejected right away with a Retry-After estimate instead of piling onto
+the upstream rate limit. Waiters are served by priority (answer streams,
+then title classification, then conversation summaries), then by the user
+with the fewest calls in progress, then first come first served. So one user
+firing many questions cannot starve the others, and no user may hold more
+than ``per_user_queue`` places in the queue.
+"""
+import math
+import time
+import asyncio
+import itertools
+from collections import Counter as Tally
+
+from rag.settings import (
+    ADMISSION_LIMIT, ADMISSION_QUEUE, ADMISSION_PER_USER_QUEUE, ADMISSION_MAX_WAIT, ADMISSION_MAX_HOLD,
+)
+from rag.metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTED
+
+# Lower runs first
+PRIORITIES = {"answer": 0, "title": 1, "summary": 2}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Admission rejected ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Permit:
+    """A granted slot; ``release()`` may be called more than once."""
+
+    def __init__(self, controller: "AdmissionController", user: str, kind: str):
+        self._controller = controller
+        self.user = user
+        self.kind = kind
+        self.granted_at = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._controller._release(self)
+
+
+class _Waiter:
+    def __init__(self, user: str, kind: str, seq: int):
+        self.user = user
+        self.kind = kind
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    def __init__(self, limit: int = ADMISSION_LIMIT, queue_size: int = ADMISSION_QUEUE,
+                 per_user_queue: int = ADMISSION_PER_USER_QUEUE, max_wait: float = ADMISSION_MAX_WAIT,
+                 max_hold: float = ADMISSION_MAX_HOLD):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.per_user_queue = per_user_queue
+        self.max_wait = max_wait
+        self.max_hold = max_hold
+        self._permits: set = set()
+        self._waiters: list = []
+        self._active_by_user = Tally()
+        self._queued_by_user = Tally()
+        self._seq = itertools.count()
+        self._avg_hold = 5.0  # seconds, moving average used for Retry-After
+
+    @property
+    def active(self) -> int:
+        return len(self._permits)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _retry_after(self) -> int:
+        rounds = (self.queued + 1) / max(self.limit, 1)
+        return max(1, min(60, math.ceil(self._avg_hold * rounds)))
+
+    def _reject(self, kind: str, reason: str):
+        ADMISSION_REJECTED.labels(kind, reason).inc()
+        raise AdmissionRejected(reason, self._retry_after())
+
+    def _expire_leases(self):
+        """Reclaim permits a crashed or abandoned request never released."""
+        now = time.monotonic()
+        for permit in [p for p in self._permits if now - p.granted_at > self.max_hold]:
+            print(f"[ADMISSION] Reclaiming {permit.kind} permit held {now - permit.granted_at:.0f}s by {permit.user}")
+            permit.release()
+
+    def _grant(self, user: str, kind: str) -> Permit:
+        permit = Permit(self, user, kind)
+        self._permits.add(permit)
+        self._active_by_user[user] += 1
+        ADMISSION_ACTIVE.inc()
+        return permit
+
+    def _release(self, permit: Permit):
+        self._permits.discard(permit)
+        self._active_by_user[permit.user] -= 1
+        if not self._active_by_user[permit.user]:
+            del self._active_by_user[permit.user]
+        ADMISSION_ACTIVE.dec()
+        held = time.monotonic() - permit.granted_at
+        self._avg_hold = 0.9 * self._avg_hold + 0.1 * held
+        self._wake()
+
+    def _dequeue(self, waiter: _Waiter):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            self._queued_by_user[waiter.user] -= 1
+            if not self._queued_by_user[waiter.user]:
+                del self._queued_by_user[waiter.user]
+            ADMISSION_QUEUE_DEPTH.labels(waiter.kind).dec()
+
+    def _wake(self):
+        while self._waiters and self.active < self.limit:
+            waiter = min(self._waiters, key=lambda w: (PRIORITIES[w.kind], self._active_by_user[w.user], w.seq))
+            self._dequeue(waiter)
+            if not waiter.future.done():
+                waiter.future.set_result(self._grant(waiter.user, waiter.kind))
+
+    async def acquire(self, user: str, kind: str = "answer", timeout: float | None = None) -> Permit:
+        """
+        Wait for a slot for *user*. Raises AdmissionRejected when the queue
+        is full or no slot frees up within *timeout* (default ``max_wait``);
+        ``timeout=0`` only takes a slot that is free right now.
+        """
+        self._expire_leases()
+        if self.active < self.limit and not self._waiters:
+            ADMISSION_WAIT_SECONDS.labels(kind).observe(0)
+            return self._grant(user, kind)
+        if timeout == 0:
+            self._reject(kind, "busy")
+        if self.queued >= self.queue_size:
+            self._reject(kind, "queue_full")
+        if self._queued_by_user[user] >= self.per_user_queue:
+            self._reject(kind, "user_queue_full")
+
+        waiter = _Waiter(user, kind, next(self._seq))
+        self._waiters.append(waiter)
+        self._queued_by_user[user] += 1
+        ADMISSION_QUEUE_DEPTH.labels(kind).inc()
+        try:
+            permit = await asyncio.wait_for(waiter.future, self.max_wait if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self._dequeue(waiter)
+            ADMISSION_WAIT_SECONDS.labels(kind).observe(time.monotonic() - waiter.enqueued_at)
+            self._reject(kind, "timeout")
+        except asyncio.CancelledError:
+            # The client went away while queued; give back a slot granted meanwhile
+            self._dequeue(waiter)
+            if waiter.future.done() and not waiter.future.cancelled():
+                waiter.future.result().release()
+            raise
+        ADMISSION_WAIT_SECONDS.labels(kind).observe(time.monotonic() - waiter.enqueued_at)
+        return permit
+
@@ -1,29 +1,53 @@
-from fastapi import FastAPI, Request, HTTPException, Depends, status
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Request, HTTPException, Depends, BackgroundTasks, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from pydantic import BaseModel
 import os
+import time
 import uuid
+import secrets
 from pathlib import Path
 from typing import Optional, Dict, Any, Generator
 from werkzeug.security import generate_password_hash, check_password_hash  
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from rag.main import build_or_update_store
-from rag.vector_store import VectorStore
-from rag.retriever import retrieve_relevant_chunks
-from rag.agent import generate_answer
-from rag.settings import MEMORY_SIZE
-import google.generativeai as genai
-from rag.settings import GEMINI_API_KEY
+from rag.sharded_store import load_store
+from rag.retriever import retrieve_relevant_chunks, SidecarClient
+from rag.agent import generate_answer, model
+from rag.settings import (
+    MEMORY_SIZE, SIDECAR_SOCKET, VECTOR_STORE_PATH, SERVER_TIMING, ADMIN_TOKEN, PROFILE_MODE,
+    SINGLE_FLIGHT, MEMORY_MODE, MEMORY_RECENT_TURNS, COMPRESSION,
+    SESSION_USER_CLAIMS, SESSION_CLAIMS_MAX_AGE, SESSION_SECRET,
+)
+from rag.memory import pair_turns, fold_count, summarize
+from rag.profiling import MODES as PROFILE_MODES, start_profile, stop_profile, list_profiles, profile_path
+from rag.metrics import (
+    timed, observe_stage, start_request_timings, finish_request_timings, render_latest,
+    DB_QUERY_SECONDS, DB_CONNECTIONS_OPEN, PROMPT_CHARS,
+)
+from backend.streaming import GenerationStream, ClosingStreamingResponse, wants_sse, text_stream, sse_stream
+from backend.coalescing import SingleFlight, flight_key
+from backend.admission import AdmissionController, AdmissionRejected
+from backend.executors import hashing, inference
+from backend.payloads import MsgspecResponse, conversation_list, conversation_detail
+from backend.compression import CompressionMiddleware
+from backend.user_cache import UserCache
 
 
-store = VectorStore.load("vector_store")
+# With a sidecar running, workers share its model and index instead of loading their own
+store = SidecarClient(SIDECAR_SOCKET) if SIDECAR_SOCKET else load_store(VECTOR_STORE_PATH)
 
-genai.configure(api_key=GEMINI_API_KEY)
+# Identical first questions asked at the same time share one generation
+answer_flights = SingleFlight()
 
-model = genai.GenerativeModel('gemini-1.5-flash')
+# Caps concurrent LLM calls; excess requests queue briefly or get a 429
+admission = AdmissionController()
+
+# User records for session checks, so polling /api/session skips the database
+user_cache = UserCache()
 
 def classify_and_generate_title(user_msg: str):
     """
@@ -41,7 +65,8 @@ SKIP
 رسالة المستخدم:
 \"\"\"{user_msg}\"\"\"
 """
-    response = model.generate_content(prompt)
+    with timed("title_llm"):
+        response = model.generate_content(prompt)
     out = response.text.strip() if hasattr(response, 'text') else response.generations[0].text.strip()
     return None if out == "SKIP" else out
 
@@ -50,7 +75,7 @@ SKIP
 app = FastAPI()
 
 # Add session middleware (equivalent to Flask-Session)
-app.add_middleware(SessionMiddleware, secret_key="your-secret-key-here")
+app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET or "your-secret-key-here")
 
 # Add CORS middleware (equivalent to Flask-CORS)
 app.add_middleware(
@@ -61,25 +86,109 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON responses (conversation histories); streams are left alone
+if COMPRESSION:
+    app.add_middleware(CompressionMiddleware)
+
 
 DATABASE_URL = os.getenv("DATABASE_URL") 
 
-def get_db_connection() -> Generator[psycopg2.extensions.connection, None, None]:
-    try:
+_DB_WRITES = {"insert", "update", "delete", "commit"}
+
+
+def _observe_db(operation: str, seconds: float):
+    DB_QUERY_SECONDS.labels(operation).observe(seconds)
+    observe_stage("db_write" if operation in _DB_WRITES else "db_read", seconds)
+
+
+class _TimedExecute:
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            operation = query.split(None, 1)[0].lower() if query.strip() else "unknown"
+            _observe_db(operation, time.perf_counter() - start)
+
+
+class TimedCursor(_TimedExecute, RealDictCursor):
+    """RealDictCursor that records statement time per SQL operation"""
+
+
+class TimedTupleCursor(_TimedExecute, psycopg2.extensions.cursor):
+    """Tuple rows, for the msgspec response paths (see backend.payloads)"""
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            _observe_db("commit", time.perf_counter() - start)
+
+
+def _connect() -> psycopg2.extensions.connection:
+    with timed("db_connect"):
         db = psycopg2.connect(
             DATABASE_URL,
-            cursor_factory=RealDictCursor  
+            connection_factory=TimedConnection,
+            cursor_factory=TimedCursor
         )
+    DB_CONNECTIONS_OPEN.inc()
+    return db
+
+
+def _close(db: psycopg2.extensions.connection):
+    db.close()
+    DB_CONNECTIONS_OPEN.dec()
+
+
+def _connection_failed(e: psycopg2.Error) -> HTTPException:
+    print(f"Database connection error: {e}")
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail="Database connection failed"
+    )
+
+
+def get_db_connection() -> Generator[psycopg2.extensions.connection, None, None]:
+    try:
+        db = _connect()
         yield db
     except psycopg2.Error as e:
-        print(f"Database connection error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database connection failed"
-        )
+        raise _connection_failed(e)
     finally:
         if 'db' in locals():
-            db.close()
+            _close(db)
+
+
+class LazyConnection:
+    """Connects on first use of ``.connection``, for routes that are usually served from a cache"""
+
+    def __init__(self):
+        self._db = None
+
+    @property
+    def connection(self) -> psycopg2.extensions.connection:
+        if self._db is None:
+            self._db = _connect()
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            _close(self._db)
+            self._db = None
+
+
+def get_lazy_db_connection() -> Generator[LazyConnection, None, None]:
+    lazy = LazyConnection()
+    try:
+        yield lazy
+    except psycopg2.Error as e:
+        raise _connection_failed(e)
+    finally:
+        lazy.close()
 
 
 
@@ -87,6 +196,12 @@ def get_db_connection() -> Generator[psycopg2.extensions.connection, None, None]
 async def get_health() :
     return {"message" : "good"}
 
+@app.get('/metrics')
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
 # Pydantic models for request validation
 class SignupRequest(BaseModel):
     name: str
@@ -114,6 +229,18 @@ async def close_db_connection(request: Request, call_next):
     
     return response
 
+if SERVER_TIMING:
+    @app.middleware("http")
+    async def add_server_timing(request: Request, call_next):
+        """Report the stages timed while handling the request in a Server-Timing header.
+        Streaming responses only include the stages that ran before the first byte."""
+        token = start_request_timings()
+        response = await call_next(request)
+        header = finish_request_timings(token)
+        if header:
+            response.headers['Server-Timing'] = header
+        return response
+
 # Authentication dependency (replaces @login_required decorator)
 async def login_required(request: Request):
     """
@@ -127,19 +254,107 @@ async def login_required(request: Request):
         )
     return request.session['user_id']
 
-# Optional: Dependency to get current user info
-async def get_current_user(request: Request, user_id: str = Depends(login_required),db: psycopg2.extensions.connection = Depends(get_db_connection)):
+def is_admin(request: Request) -> bool:
+    """Admin access is granted by the X-Admin-Token header matching ADMIN_TOKEN"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and secrets.compare_digest(token, ADMIN_TOKEN)
 
-    cursor = db.cursor()
-    
+async def admin_required(request: Request):
+    if not is_admin(request):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+async def profile_request(request: Request):
+    """
+    Profile the request when it is sampled (PROFILE_SAMPLE_RATE) or when an
+    admin asks for it with X-Profile: cpu|wall. The handler hands the session
+    over to its streaming response, which stops it once the body has been
+    sent; it is only stopped here when the handler fails.
+    """
+    mode = None
+    requested = request.headers.get('X-Profile')
+    if requested and is_admin(request):
+        mode = requested if requested in PROFILE_MODES else PROFILE_MODE
+    label = getattr(request.scope.get('endpoint'), '__name__', 'request')
+    session = start_profile(label, mode)
+    try:
+        yield session
+    except Exception:
+        stop_profile(session)
+        raise
+
+async def answer_slot(user_id: str = Depends(login_required)):
+    """
+    Wait for an LLM slot for this user's answer, or fail fast with 429 and
+    Retry-After. The handler hands the slot over to the response (or to the
+    shared generation it starts); it is only released here when the handler fails.
+    """
+    try:
+        permit = await admission.acquire(user_id, "answer")
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please try again shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    try:
+        yield permit
+    except Exception:
+        permit.release()
+        raise
+
+def _fetch_user(db: LazyConnection, user_id: str) -> Optional[dict]:
+    cursor = db.connection.cursor()
     cursor.execute(
         "SELECT id, name, email FROM users WHERE id = %s", (user_id,)
     )
     user = cursor.fetchone()
+    return dict(user) if user else None
+
+def start_session(request: Request, user: dict):
+    """Log the user in; with SESSION_USER_CLAIMS the verified record rides in the signed cookie"""
+    request.session['user_id'] = user['id']
+    if SESSION_USER_CLAIMS:
+        request.session['user'] = {
+            "id": user['id'],
+            "name": user['name'],
+            "email": user['email'],
+            "verified_at": int(time.time()),
+        }
+
+def end_session(request: Request):
+    request.session.pop('user_id', None)
+    request.session.pop('user', None)
+
+def session_user(request: Request, db: LazyConnection) -> Optional[dict]:
+    """
+    The logged-in user's record: from fresh session claims, else the user
+    cache, else the database. Clears the session if the user no longer exists.
+    """
+    user_id = request.session.get('user_id')
+    if user_id is None:
+        return None
+    claims = request.session.get('user')
+    if (SESSION_USER_CLAIMS and claims and claims['id'] == user_id
+            and time.time() - claims['verified_at'] < SESSION_CLAIMS_MAX_AGE):
+        return {"id": claims['id'], "name": claims['name'], "email": claims['email']}
+
+    user = user_cache.get_or_load(user_id, lambda uid: _fetch_user(db, uid))
+    if not user:
+        end_session(request)
+        return None
+    if SESSION_USER_CLAIMS:
+        start_session(request, user)
+    return user
+
+# Optional: Dependency to get current user info
+async def get_current_user(request: Request, user_id: str = Depends(login_required), db: LazyConnection = Depends(get_lazy_db_connection)):
+
+    user = session_user(request, db)
     
     if not user:
-        # Clear invalid session
-        request.session.pop('user_id', None)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid session"
@@ -176,7 +391,7 @@ async def signup(request: Request, signup_data: SignupRequest,db: psycopg2.exten
     
     # Create new user
     user_id = str(uuid.uuid4())
-    hashed_password = generate_password_hash(signup_data.password)
+    hashed_password = await hashing.run(generate_password_hash, signup_data.password)
     
     try:
         cursor.execute(
@@ -185,16 +400,15 @@ async def signup(request: Request, signup_data: SignupRequest,db: psycopg2.exten
         )
         db.commit()
         
+        user = {"id": user_id, "name": signup_data.name, "email": signup_data.email}
+        user_cache.put(user)
+        
         # Create session
-        request.session['user_id'] = user_id
+        start_session(request, user)
         
         return {
             "message": "User registered successfully",
-            "user": {
-                "id": user_id,
-                "name": signup_data.name,
-                "email": signup_data.email
-            }
+            "user": user
         }
     except Exception as e:
         raise HTTPException(
@@ -221,14 +435,15 @@ async def login(request: Request, login_data: LoginRequest,db: psycopg2.extensio
         )
     
     # Check password
-    if not check_password_hash(user['password'], login_data.password):
+    if not await hashing.run(check_password_hash, user['password'], login_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
-    # Create session
-    request.session['user_id'] = user['id']
+    # Create session (the row was just read, so it also refreshes the cache)
+    user_cache.put({"id": user['id'], "name": user['name'], "email": user['email']})
+    start_session(request, user)
 
     return {
         "message": "Login successful",
@@ -242,24 +457,18 @@ async def login(request: Request, login_data: LoginRequest,db: psycopg2.extensio
 @app.post('/api/logout', response_model=Dict[str, str])
 async def logout(request: Request):
     """User logout endpoint"""
-    request.session.pop('user_id', None)
+    user_id = request.session.get('user_id')
+    if user_id is not None:
+        user_cache.invalidate(user_id)
+    end_session(request)
     return {"message": "Logout successful"}
 
 @app.get('/api/session', response_model=Dict[str, Any])
-async def get_session(request: Request, db: psycopg2.extensions.connection = Depends(get_db_connection)):
+async def get_session(request: Request, db: LazyConnection = Depends(get_lazy_db_connection)):
 
-    if 'user_id' not in request.session:
-        return {"authenticated": False}
-
-    cursor = db.cursor()
-
-    cursor.execute(
-        "SELECT id, name, email FROM users WHERE id = %s", (request.session['user_id'],)
-    )
-    user = cursor.fetchone()
+    user = session_user(request, db)
     
     if not user:
-        request.session.pop('user_id', None)
         return {"authenticated": False}
     
     return {
@@ -296,127 +505,18 @@ async def get_conversations(
 ):
     """Get all conversations for the authenticated user"""
     
-    cursor = db.cursor()
-
-    # Include is_new in the select statement
-    cursor.execute(
-        """
-        SELECT id, title, created_at, updated_at, is_new
-        FROM conversations
-        WHERE user_id = %s
-        ORDER BY updated_at DESC
-        """,
-        (user_id,)
-    )
-    conversations = cursor.fetchall()
-
-    result = []
-    for conv in conversations:
-        result.append({
-            "id": conv['id'],
-            "title": conv['title'],
-        })
-
-    return {"conversations": result}
-
-@app.post('/api/conversations', response_model=CreateConversationResponse)
-async def create_conversation(
-    request: Request,
-    conversation_data: CreateConversationRequest,
-    user_id: str = Depends(login_required),
-    db: psycopg2.extensions.connection = Depends(get_db_connection)
-):
-    """Create a new conversation or return existing 'new' conversation"""
-    
-    # The title might be provided, but we prioritize finding an existing new conversation
-    requested_title = conversation_data.title
-    
-    cursor = db.cursor()
-
-    # Check if an existing 'new' conversation exists for this user
-    cursor.execute(
-        "SELECT id, title FROM conversations WHERE user_id = %s AND is_new = TRUE LIMIT 1",
-        (user_id,)
-    )
-    existing_new_conversation = cursor.fetchone()
-
-    print(existing_new_conversation)
-
-    if existing_new_conversation:
-        # If a 'new' conversation exists, return it with 200 OK status
-        return CreateConversationResponse(
-            id=existing_new_conversation['id'],
-            title=existing_new_conversation['title']
-        )
-
-    # If no 'new' conversation exists, create a new one
-    conversation_id = str(uuid.uuid4())
-    title_to_use = requested_title  # Use the requested title or default
-
-    try:
-        cursor.execute(
-            "INSERT INTO conversations (id, user_id, title, is_new) VALUES (%s, %s, %s, TRUE)",
-            (conversation_id, user_id, title_to_use)
-        )
-        db.commit()  # Commit the new conversation
-
-        # Return with 201 Created status (FastAPI automatically uses 201 for POST)
-        return CreateConversationResponse(
-            id=conversation_id,
-            title=title_to_use
-        )
-    except Exception as e:
-        db.rollback()  # Rollback changes if something goes wrong
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
-
-class ConversationResponse(BaseModel):
-    id: str
-    title: str
-
-class ConversationsListResponse(BaseModel):
-    conversations: list[ConversationResponse]
-
-class CreateConversationRequest(BaseModel):
-    title: Optional[str] = "New Conversation"
-
-class CreateConversationResponse(BaseModel):
-    id: str
-    title: str
-
-# Conversations & Messages routes
-@app.get('/api/conversations', response_model=ConversationsListResponse)
-async def get_conversations(
-    request: Request,
-    user_id: str = Depends(login_required),
-    db: psycopg2.extensions.connection = Depends(get_db_connection)
-):
-    """Get all conversations for the authenticated user"""
-    
-    cursor = db.cursor()
+    cursor = db.cursor(cursor_factory=TimedTupleCursor)
 
-    # Include is_new in the select statement
     cursor.execute(
         """
-        SELECT id, title, created_at, updated_at, is_new
+        SELECT id, title
         FROM conversations
         WHERE user_id = %s
         ORDER BY updated_at DESC
         """,
         (user_id,)
     )
-    conversations = cursor.fetchall()
-
-    result = []
-    for conv in conversations:
-        result.append({
-            "id": conv['id'],
-            "title": conv['title'],
-        })
-
-    return {"conversations": result}
+    return MsgspecResponse(conversation_list(cursor.fetchall()))
 
 @app.post('/api/conversations', response_model=CreateConversationResponse)
 async def create_conversation(
@@ -439,8 +539,6 @@ async def create_conversation(
     )
     existing_new_conversation = cursor.fetchone()
 
-    print(existing_new_conversation)
-
     if existing_new_conversation:
         # If a 'new' conversation exists, return it with 200 OK status
         return CreateConversationResponse(
@@ -493,7 +591,7 @@ async def get_conversation(
 ):
     """Get a specific conversation with all its messages"""
     
-    cursor = db.cursor()
+    cursor = db.cursor(cursor_factory=TimedTupleCursor)
 
     # Verify conversation belongs to user
     cursor.execute(
@@ -518,26 +616,20 @@ async def get_conversation(
         """,
         (conversation_id,)
     )
-    messages = cursor.fetchall()
-    
-    messages_list = []
-    for msg in messages:
-        messages_list.append({
-            "id": msg['id'],
-            "is_user": bool(msg['is_user']),
-            "content": msg['content'],
-            "created_at": str(msg['created_at'])  # Convert to string for JSON serialization
-        })
-    
-    return ConversationDetailResponse(
-        id=conversation['id'],
-        title=conversation['title'],
-        messages=messages_list
-    )
+    return MsgspecResponse(conversation_detail(conversation[0], conversation[1], cursor.fetchall()))
+
 
+class SearchFilters(BaseModel):
+    """Optional scope for retrieval; each list matches any of its values"""
+    source: Optional[list[str]] = None
+    doc_type: Optional[list[str]] = None
+    article: Optional[list[int]] = None
+    date_from: Optional[str] = None  # ISO date, inclusive
+    date_to: Optional[str] = None
 
 class MessageRequest(BaseModel):
     message: str
+    filters: Optional[SearchFilters] = None
 
 class SaveMessageResponse(BaseModel):
     success: bool
@@ -552,6 +644,9 @@ async def stream_answer(
     message_data: MessageRequest,
     request: Request,
     user_id: str = Depends(login_required),
+    profile=Depends(profile_request),
+    # Dependencies run in order: wait for admission before taking a DB connection
+    permit=Depends(answer_slot),
     db: psycopg2.extensions.connection = Depends(get_db_connection)
 ):
     """Stream AI response for a conversation message"""
@@ -592,7 +687,16 @@ async def stream_answer(
 
     # Handle title generation logic
     if bool(conversation['is_title_changed']) == False:
-        new_title = classify_and_generate_title(message)  # You'll need to implement this
+        # Titles only use spare LLM capacity; when busy, the next message retries
+        try:
+            title_permit = await admission.acquire(user_id, "title", timeout=0)
+        except AdmissionRejected:
+            new_title = None
+        else:
+            try:
+                new_title = await run_in_threadpool(classify_and_generate_title, message)
+            finally:
+                title_permit.release()
         
         if new_title:
             # If the title has not been changed, update it to the first message
@@ -611,41 +715,85 @@ async def stream_answer(
     db.commit()  # Commit user message
 
     # Build conversation history
-    cursor.execute("""
-        SELECT is_user, content FROM messages
-        WHERE conversation_id = %s
-        ORDER BY created_at ASC
-        LIMIT %s
-    """, (conversation_id, MEMORY_SIZE * 2))  # You'll need to define MEMORY_SIZE
-    
-    history = cursor.fetchall()
-    conversation_history = [
-        (history[i]['content'], history[i + 1]['content'])
-        for i in range(0, len(history) - 1, 2)
-        if history[i]['is_user'] and not history[i + 1]['is_user']
-    ]
+    summary = ""
+    if MEMORY_MODE == "summary":
+        # Rolling summary of the folded turns, then the most recent turns verbatim
+        cursor.execute(
+            "SELECT summary, summary_messages FROM conversations WHERE id = %s",
+            (conversation_id,)
+        )
+        memory = cursor.fetchone()
+        summary = memory['summary']
+        cursor.execute("""
+            SELECT is_user, content FROM messages
+            WHERE conversation_id = %s
+            ORDER BY created_at ASC
+            OFFSET %s
+        """, (conversation_id, memory['summary_messages']))
+        conversation_history = pair_turns(cursor.fetchall())[-MEMORY_RECENT_TURNS:]
+    else:
+        cursor.execute("""
+            SELECT is_user, content FROM messages
+            WHERE conversation_id = %s
+            ORDER BY created_at ASC
+            LIMIT %s
+        """, (conversation_id, MEMORY_SIZE * 2))  # You'll need to define MEMORY_SIZE
+
+        history = cursor.fetchall()
+        conversation_history = [
+            (history[i]['content'], history[i + 1]['content'])
+            for i in range(0, len(history) - 1, 2)
+            if history[i]['is_user'] and not history[i + 1]['is_user']
+        ]
 
     # Retrieve relevant chunks and build prompt
-    chunks = retrieve_relevant_chunks(store, message, top_k=5)  # You'll need to implement this
-    prompt = build_prompt(chunks, message, conversation_history)
-
-    def generate() -> Generator[str, None, None]:
-        """Generator function for streaming response"""
-        try:
-            for chunk in model.generate_content(prompt, stream=True):
-                if chunk.text:
-                    yield chunk.text
-        except Exception as e:
-            yield f"Error: {str(e)}"
-
-    # Return streaming response
-    return StreamingResponse(
-        generate(),
+    filters = message_data.filters.model_dump(exclude_none=True) if message_data.filters else None
+    chunks = await inference.run(retrieve_relevant_chunks, store, message, top_k=5, filters=filters)
+    with timed("build_prompt"):
+        prompt = build_prompt(chunks, message, conversation_history, summary)
+    PROMPT_CHARS.observe(len(prompt))
+
+    # Generation runs in a worker thread and is cancelled if the client leaves.
+    # Without history the answer depends only on the question and context,
+    # so concurrent identical questions attach to the same generation.
+    # The LLM slot is held for as long as the generation runs: a shared one
+    # may outlive the request that started it.
+    start_generation = lambda: model.generate_content(prompt, stream=True)
+    if SINGLE_FLIGHT and not conversation_history and not summary:
+        stream = answer_flights.subscribe(flight_key(message, chunks), start_generation)
+        if stream.joined:
+            permit.release()  # no new LLM call for this request
+        else:
+            stream.on_flight_end(permit.release)
+        release_permit = []
+    else:
+        stream = GenerationStream(start_generation)
+        release_permit = [permit.release]
+
+    # Once the response is over, whether or not its body was read: leave or
+    # cancel the generation, and stop the profile (which covers generation)
+    on_close = [stream.close, *release_permit, lambda: stop_profile(profile)]
+
+    # Server-Sent Events for clients that ask for them, plain text otherwise
+    if wants_sse(request):
+        return ClosingStreamingResponse(
+            sse_stream(stream, request),
+            media_type='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'Connection': 'keep-alive',
+                'X-Accel-Buffering': 'no',
+            },
+            on_close=on_close
+        )
+    return ClosingStreamingResponse(
+        text_stream(stream, request),
         media_type='text/plain',
         headers={
             'Cache-Control': 'no-cache',
             'Connection': 'keep-alive',
-        }
+        },
+        on_close=on_close
     )
 
 @app.post('/api/stream-answer/{conversation_id}/ai-message', response_model=SaveMessageResponse)
@@ -653,6 +801,7 @@ async def save_ai_answer(
     conversation_id: str,
     message_data: MessageRequest,
     request: Request,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(login_required),
     db: psycopg2.extensions.connection = Depends(get_db_connection)
 ):
@@ -689,11 +838,63 @@ async def save_ai_answer(
     )
     db.commit()  # Commit AI message
 
+    # Fold the turn that just left the verbatim window into the summary
+    if MEMORY_MODE == "summary":
+        background_tasks.add_task(refresh_summary, conversation_id, user_id)
+
     return SaveMessageResponse(
         success=True,
         message="AI message inserted in db successfully"
     )
 
+def fold_conversation_summary(conversation_id: str):
+    """Fold the turns older than the verbatim window into the stored summary."""
+    connections = get_db_connection()
+    db = next(connections)
+    try:
+        cursor = db.cursor()
+        cursor.execute(
+            "SELECT summary, summary_messages FROM conversations WHERE id = %s",
+            (conversation_id,)
+        )
+        memory = cursor.fetchone()
+        if not memory:
+            return
+        cursor.execute("""
+            SELECT is_user, content FROM messages
+            WHERE conversation_id = %s
+            ORDER BY created_at ASC
+            OFFSET %s
+        """, (conversation_id, memory['summary_messages']))
+        messages = cursor.fetchall()
+        count = fold_count(messages, MEMORY_RECENT_TURNS)
+        if not count:
+            return
+
+        with timed("summary_llm"):
+            summary = summarize(model, memory['summary'], pair_turns(messages[:count]))
+        # Skipped if a concurrent update already folded these messages
+        cursor.execute(
+            "UPDATE conversations SET summary = %s, summary_messages = %s WHERE id = %s AND summary_messages = %s",
+            (summary, memory['summary_messages'] + count, conversation_id, memory['summary_messages'])
+        )
+        db.commit()
+    finally:
+        connections.close()
+
+async def refresh_summary(conversation_id: str, user_id: str):
+    # Lowest-priority LLM work: when no slot frees up, a later turn folds these messages too
+    try:
+        permit = await admission.acquire(user_id, "summary")
+    except AdmissionRejected:
+        return
+    try:
+        await run_in_threadpool(fold_conversation_summary, conversation_id)
+    except Exception as e:
+        print(f"[MEMORY] Summary update failed for {conversation_id}: {e}")
+    finally:
+        permit.release()
+
 @app.delete('/api/conversations/{conversation_id}', response_model=Dict[str, str])
 async def delete_conversation(
     conversation_id: str,
@@ -735,4 +936,21 @@ async def delete_conversation(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+# Profiling artifacts
+@app.get('/api/admin/profiles', dependencies=[Depends(admin_required)])
+async def get_profiles():
+    """List stored profiling artifacts, newest first"""
+    return {"profiles": list_profiles()}
+
+@app.get('/api/admin/profiles/{name}', dependencies=[Depends(admin_required)])
+async def download_profile(name: str):
+    """Download one profiling artifact"""
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return FileResponse(path, filename=name, media_type='application/octet-stream')
@@ -0,0 +1,163 @@
+# backend/coalescing.py
+"""
+Single-flight coalescing of identical in-flight answers.
+
+When many users ask the same first question at once (no conversation
+history, same retrieved context), one LLM generation is started and its
+chunks are fanned out to every request that asks while it is running. The
+answer is kept once per flight and each subscriber reads it at its own pace,
+so a late joiner gets the whole answer from the start. Generation runs at
+most ``max_ahead`` chunks ahead of the fastest subscriber, so when nobody
+reads, the upstream stream pauses as it does for a single slow client. A
+flight is forgotten as soon as it ends, so this never serves stale answers,
+and the upstream call is cancelled only when its last subscriber has left.
+"""
+import re
+import json
+import asyncio
+import hashlib
+from contextlib import aclosing
+from typing import AsyncIterator, Callable
+
+from fastapi import Request
+
+from backend.streaming import GenerationStream, POLL_SECONDS
+from rag.metrics import record_cache
+from rag.settings import STREAM_BUFFER_CHUNKS
+
+# Arabic diacritics and tatweel, which do not change the question
+_DIACRITICS_RE = re.compile("[\u064B-\u0652\u0640]")
+_TRAILING_PUNCT_RE = re.compile(r"[\s?؟.!،,]+$")
+
+
+def normalize_question(text: str) -> str:
+    text = _DIACRITICS_RE.sub("", text)
+    text = " ".join(text.split())
+    return _TRAILING_PUNCT_RE.sub("", text).casefold()
+
+
+def flight_key(question: str, chunks: list) -> str:
+    payload = json.dumps([normalize_question(question), chunks], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Flight:
+    """One upstream generation and the chunks it has produced so far."""
+
+    def __init__(self, start: Callable, on_close: Callable, max_ahead: int = STREAM_BUFFER_CHUNKS):
+        self.items: list = []
+        self.closed = False
+        self.finished = False
+        self.max_ahead = max_ahead
+        self.positions: dict = {}  # subscription -> items it has read
+        self._on_close = on_close
+        self._changed = asyncio.Event()
+        self._advanced = asyncio.Event()
+        self._stream = GenerationStream(start)
+        self._task = asyncio.get_running_loop().create_task(self._pump())
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _pump(self):
+        try:
+            async with aclosing(self._stream.follow()) as items:
+                async for item in items:
+                    if item is None:
+                        continue
+                    # Backpressure: wait for the fastest subscriber to catch up
+                    while self.positions and len(self.items) - max(self.positions.values()) >= self.max_ahead:
+                        self._advanced.clear()
+                        await self._advanced.wait()
+                    self.items.append(item)
+                    self._notify()
+        finally:
+            self.finished = self._stream.finished
+            self.closed = True
+            self._on_close(self)
+            self._notify()
+
+    def join(self, subscription):
+        self.positions[subscription] = 0
+
+    def advance(self, subscription, position: int):
+        self.positions[subscription] = position
+        self._advanced.set()
+
+    def leave(self, subscription):
+        self.positions.pop(subscription, None)
+        self._advanced.set()
+        if not self.positions and not self.closed:
+            # Nobody is listening any more: new askers start a fresh flight
+            self.closed = True
+            self._on_close(self)
+            self._task.cancel()
+
+
+class Subscription:
+    """A request's view of a flight, usable wherever a GenerationStream is."""
+
+    def __init__(self, flight: Flight, joined: bool):
+        self._flight = flight
+        self.joined = joined  # attached to a generation that was already running
+        self.finished = False
+        self._left = False
+        # Counted from the start, so the flight is not cancelled while this
+        # request's response is still being set up
+        flight.join(self)
+
+    def on_flight_end(self, callback: Callable):
+        """Call *callback* once the shared generation stops (done, failed or
+        cancelled), which may be after this subscriber has left."""
+        self._flight._task.add_done_callback(lambda task: callback())
+
+    def close(self):
+        """Leave the flight; safe to call again, and whether or not ``follow`` ever ran."""
+        if not self._left:
+            self._left = True
+            self._flight.leave(self)
+
+    async def follow(self, request: Request | None = None) -> AsyncIterator:
+        flight = self._flight
+        position = 0
+        try:
+            while True:
+                changed = flight._changed
+                while position < len(flight.items):
+                    yield flight.items[position]
+                    position += 1
+                    flight.advance(self, position)
+                if flight.closed:
+                    self.finished = flight.finished
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    if request is not None and await request.is_disconnected():
+                        return
+                    yield None
+        finally:
+            self.close()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: dict = {}
+
+    def subscribe(self, key: str, start: Callable) -> Subscription:
+        """Join the running generation for *key*, or start one with ``start()``."""
+        flight = self._flights.get(key)
+        joined = flight is not None
+        record_cache("answer_flight", joined)
+        if not joined:
+            flight = Flight(start, on_close=lambda f: self._forget(key, f))
+            self._flights[key] = flight
+        return Subscription(flight, joined)
+
+    def _forget(self, key: str, flight: Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def __len__(self) -> int:
+        return len(self._flights)
@@ -0,0 +1,104 @@
+# backend/compression.py
+"""
+Response compression for complete (non-streaming) responses.
+
+Bodies of at least ``minimum_size`` bytes are compressed with brotli when the
+client accepts it and the ``brotli`` package is installed, otherwise gzip.
+Streaming responses (answer streams, SSE) are passed through untouched:
+compressing them would hold tokens back in the compressor's buffer. So are
+responses that already carry a Content-Encoding. Which ones to pass through
+is decided from the response headers, so their headers are not delayed.
+"""
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from rag.settings import COMPRESSION_MIN_BYTES, GZIP_LEVEL, BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+
+def _accepted(accept_encoding: str) -> set:
+    """Codings in an Accept-Encoding header, minus those refused with ``q=0``."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        weight = params.strip().removeprefix("q=")
+        try:
+            if weight and float(weight) == 0:
+                continue
+        except ValueError:
+            pass
+        accepted.add(coding.strip())
+    return accepted
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES,
+                 gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = _accepted(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                length = headers.get("content-length")
+                if ("content-encoding" in headers or length is None
+                        or headers.get("content-type", "").startswith("text/event-stream")
+                        or int(length) < self.minimum_size):
+                    # Already encoded, streaming (no length) or too small: send as is, right away
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # Sent in pieces despite a known length (files): pass through
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if encoding == "br":
+                compressed = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
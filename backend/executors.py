@@ -0,0 +1,56 @@
+# backend/executors.py
+"""
+Thread pools for CPU-heavy work called from async handlers.
+
+Password hashing and retrieval (embedding + FAISS search) would otherwise
+run on the event loop thread and stall every other request, including
+streams in progress. Each kind of work gets its own small pool, so a burst
+of logins cannot delay retrieval and the other way round. The number of
+calls queued or running per pool is capped (callers beyond the cap wait
+without blocking the loop), and queue wait and pending work are exported
+as metrics.
+"""
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from rag.settings import HASH_WORKERS, HASH_MAX_PENDING, INFERENCE_WORKERS, INFERENCE_MAX_PENDING
+from rag.metrics import EXECUTOR_PENDING, EXECUTOR_WAIT_SECONDS
+from rag.profiling import worker_profile
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, workers: int, max_pending: int):
+        self.name = name
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots: asyncio.Semaphore | None = None
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` in the pool, keeping the caller's context
+        (so stage timings still reach the request's Server-Timing header and a
+        "cpu" profile of the request also covers the call)."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        submitted = time.perf_counter()
+        context = contextvars.copy_context()
+
+        def work():
+            with worker_profile():
+                return fn(*args, **kwargs)
+
+        def call():
+            EXECUTOR_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - submitted)
+            return context.run(work)
+
+        EXECUTOR_PENDING.labels(self.name).inc()
+        try:
+            async with self._slots:
+                return await asyncio.get_running_loop().run_in_executor(self._pool, call)
+        finally:
+            EXECUTOR_PENDING.labels(self.name).dec()
+
+
+hashing = BoundedExecutor("hashing", HASH_WORKERS, HASH_MAX_PENDING)
+inference = BoundedExecutor("inference", INFERENCE_WORKERS, INFERENCE_MAX_PENDING)
@@ -0,0 +1,57 @@
+# backend/payloads.py
+"""
+Fast JSON responses for the conversation endpoints.
+
+Conversation histories are long Arabic Markdown documents. The default path
+builds a dict per row (RealDictCursor), validates it with Pydantic, runs it
+through ``jsonable_encoder`` and encodes it with the standard library. Here
+the rows are fetched as plain tuples, packed straight into msgspec Structs
+and encoded in one C call, producing the same JSON as before (Arabic text
+written as UTF-8, not ``\\uXXXX`` escapes).
+"""
+import msgspec
+from fastapi.responses import Response
+
+_encoder = msgspec.json.Encoder()
+
+
+class ConversationItem(msgspec.Struct):
+    id: str
+    title: str
+
+
+class ConversationList(msgspec.Struct):
+    conversations: list[ConversationItem]
+
+
+class MessageItem(msgspec.Struct):
+    id: str
+    is_user: bool
+    content: str
+    created_at: str
+
+
+class ConversationDetail(msgspec.Struct):
+    id: str
+    title: str
+    messages: list[MessageItem]
+
+
+class MsgspecResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return _encoder.encode(content)
+
+
+def conversation_list(rows: list) -> ConversationList:
+    """From ``(id, title)`` rows."""
+    return ConversationList([ConversationItem(str(id), title) for id, title in rows])
+
+
+def conversation_detail(conversation_id: str, title: str, rows: list) -> ConversationDetail:
+    """From ``(id, is_user, content, created_at)`` rows; timestamps keep their ``str()`` form."""
+    return ConversationDetail(str(conversation_id), title, [
+        MessageItem(str(id), bool(is_user), content, str(created_at))
+        for id, is_user, content, created_at in rows
+    ])
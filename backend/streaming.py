@@ -0,0 +1,227 @@
+# backend/streaming.py
+"""
+Cancellation-aware answer streaming.
+
+The blocking LLM stream runs in its own thread and hands text to the event
+loop through a bounded queue: when a slow client stops reading, the queue
+fills up and the producer stops pulling from the model instead of buffering
+the whole answer in memory. When the client goes away (closed tab, stop
+button, dead connection) the stream is cancelled: the producer stops, the
+upstream response is cancelled where the client library allows it, and the
+worker thread is released.
+
+Two wire formats share this machinery: plain text (the original format)
+and Server-Sent Events with periodic heartbeats.
+"""
+import json
+import time
+import asyncio
+import threading
+import concurrent.futures
+from contextlib import aclosing
+from typing import AsyncIterator, Callable
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from rag.settings import STREAM_BUFFER_CHUNKS, SSE_HEARTBEAT_SECONDS
+from rag.metrics import observe_stage, PROMPT_TOKENS, LLM_STREAMS
+
+# How often an idle stream checks whether the client is still connected
+POLL_SECONDS = 1.0
+
+_DONE = object()
+
+
+def _cancel_upstream(response):
+    """Best effort: cancel the upstream call behind a streaming LLM response."""
+    for target in (getattr(response, "_iterator", None), response):
+        cancel = getattr(target, "cancel", None)
+        if callable(cancel):
+            try:
+                cancel()
+            except Exception:
+                pass
+
+
+class GenerationStream:
+    """
+    Runs ``start()`` (e.g. ``lambda: model.generate_content(prompt, stream=True)``)
+    in a worker thread and exposes its text chunks to async code.
+    """
+
+    def __init__(self, start: Callable, max_buffered: int = STREAM_BUFFER_CHUNKS):
+        self._start = start
+        self._max_buffered = max_buffered
+        self._stop = threading.Event()
+        self._finished = False
+        self._response = None
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+
+    def open(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self._max_buffered)
+        self._thread = threading.Thread(target=self._produce, name="llm-stream", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        _cancel_upstream(self._response)
+
+    @property
+    def finished(self) -> bool:
+        """True once the consumer has received the end of the answer."""
+        return self._finished
+
+    def close(self):
+        """Cancel the generation unless it completed (no-op if it never started)."""
+        if not self._finished:
+            self.cancel()
+
+    # ------------------------------------------------------------
+    # Producer (worker thread)
+    # ------------------------------------------------------------
+    def _put(self, item) -> bool:
+        """Block until the consumer has room for *item*; False once cancelled."""
+        future = asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop)
+        while True:
+            try:
+                future.result(timeout=POLL_SECONDS)
+                return True
+            except concurrent.futures.TimeoutError:
+                if self._stop.is_set():
+                    future.cancel()
+                    return False
+
+    def _produce(self):
+        start = time.perf_counter()
+        first_token = True
+        usage = None
+        outcome = "completed"
+        try:
+            self._response = self._start()
+            for chunk in self._response:
+                if self._stop.is_set():
+                    break
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                if chunk.text:
+                    if first_token:
+                        observe_stage("llm_ttft", time.perf_counter() - start)
+                        first_token = False
+                    if not self._put(chunk.text):
+                        break
+        except Exception as e:
+            if not self._stop.is_set():
+                outcome = "error"
+                self._put(e)
+        finally:
+            if self._stop.is_set():
+                outcome = "cancelled"
+                _cancel_upstream(self._response)
+                close = getattr(self._response, "close", None)
+                if callable(close):
+                    close()
+            observe_stage("llm_stream", time.perf_counter() - start)
+            if usage is not None and getattr(usage, 'prompt_token_count', None):
+                PROMPT_TOKENS.observe(usage.prompt_token_count)
+            LLM_STREAMS.labels(outcome).inc()
+            if not self._stop.is_set():
+                self._put(_DONE)
+
+    # ------------------------------------------------------------
+    # Consumer (event loop)
+    # ------------------------------------------------------------
+    async def follow(self, request: Request | None = None) -> AsyncIterator:
+        """
+        Yield text chunks as they arrive, ``None`` after every idle second
+        and exceptions raised by the model as values. Cancels the generation
+        when the client of *request* disconnects or the consumer stops iterating.
+        """
+        self.open()
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    if request is not None and await request.is_disconnected():
+                        return
+                    yield None
+                    continue
+                if item is _DONE:
+                    self._finished = True
+                    return
+                yield item
+        finally:
+            self.close()
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that calls each of *on_close* once the response is
+    over: body sent, failed, cut short by a disconnect or never started.
+    """
+
+    def __init__(self, content, *args, on_close: tuple = (), **kwargs):
+        super().__init__(content, *args, **kwargs)
+        self.on_close = list(on_close)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            for callback in self.on_close:
+                callback()
+
+
+def wants_sse(request: Request) -> bool:
+    return "text/event-stream" in request.headers.get("accept", "")
+
+
+async def text_stream(stream, request: Request) -> AsyncIterator[str]:
+    """
+    The plain-text format: raw answer text, errors inlined as ``Error: ...``.
+    *stream* is a GenerationStream or anything with the same ``follow``/``finished``.
+    """
+    async with aclosing(stream.follow(request)) as items:
+        async for item in items:
+            if item is None:
+                continue
+            if isinstance(item, Exception):
+                yield f"Error: {str(item)}"
+                return
+            yield item
+
+
+def _sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def sse_stream(stream, request: Request,
+                     heartbeat: float = SSE_HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+    """
+    Server-Sent Events: ``data: {"text": ...}`` per chunk, a ``: ping``
+    comment after *heartbeat* idle seconds (keeps proxies from closing the
+    connection and surfaces dead clients), then ``event: done`` or
+    ``event: error``.
+    """
+    idle = 0.0
+    async with aclosing(stream.follow(request)) as items:
+        async for item in items:
+            if item is None:
+                idle += POLL_SECONDS
+                if idle >= heartbeat:
+                    idle = 0.0
+                    yield ": ping\n\n"
+                continue
+            idle = 0.0
+            if isinstance(item, Exception):
+                yield _sse({"detail": str(item)}, event="error")
+                return
+            yield _sse({"text": item})
+    if stream.finished:
+        yield _sse({}, event="done")
@@ -0,0 +1,60 @@
+# backend/user_cache.py
+"""
+Read-through TTL cache of user records, keyed by user id.
+
+``/api/session`` is polled by the frontend and every authenticated lookup used
+to read the ``users`` row again. Records are kept for ``ttl`` seconds;
+only lookups of a missing or expired entry reach the database. Unknown ids
+are not cached, so a deleted user is rejected on the next miss. Anything that
+changes a ``users`` row must call ``invalidate`` (or ``put`` the new record).
+The cache lives in one process: other API workers keep their copy until it
+expires. Lookups are counted as ``rag_cache_requests_total{cache="user"}``.
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from rag.metrics import record_cache
+from rag.settings import USER_CACHE_TTL, USER_CACHE_MAX_ENTRIES
+
+
+class UserCache:
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # user id -> (expires, record)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                return entry[1]
+            self._entries.pop(user_id, None)
+            return None
+
+    def put(self, record: dict):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[record["id"]] = (time.monotonic() + self.ttl, record)
+            self._entries.move_to_end(record["id"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def get_or_load(self, user_id: str, load: Callable[[str], Optional[dict]]) -> Optional[dict]:
+        """The cached record, or ``load(user_id)`` on a miss (cached unless None)."""
+        record = self.get(user_id)
+        hit = record is not None
+        if not hit:
+            record = load(user_id)
+            if record is not None:
+                self.put(record)
+        record_cache("user", hit)
+        return record
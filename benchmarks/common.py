@@ -0,0 +1,103 @@
+# benchmarks/common.py
+"""Helpers shared by the benchmark scripts: percentiles, memory, reports."""
+import io
+import os
+import sys
+import json
+import math
+import time
+import platform
+import resource
+import contextlib
+
+
+def percentiles(values: list, points=(50, 95, 99)) -> dict:
+    """Nearest-rank percentiles of *values*, keyed ``p50``, ``p95``, ..."""
+    if not values:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        rank = max(1, min(len(ordered), math.ceil(p / 100 * len(ordered))))
+        result[f"p{p}"] = ordered[rank - 1]
+    return result
+
+
+def latency_summary(seconds: list) -> dict:
+    """p50/p95/p99/mean of a list of durations, in milliseconds."""
+    ms = [s * 1000 for s in seconds]
+    summary = {k: round(v, 3) if v is not None else None for k, v in percentiles(ms).items()}
+    summary["mean"] = round(sum(ms) / len(ms), 3) if ms else None
+    summary["count"] = len(ms)
+    return summary
+
+
+def rss_mb() -> float:
+    """Current resident set size in MiB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """Silence the progress bars and debug prints of the pipeline."""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def report_meta(**extra) -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        **extra,
+    }
+
+
+def write_report(report: dict, out: str | None):
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"📄 Report written to {out}")
+    else:
+        print(text)
+
+
+def _flatten(prefix: str, value, into: dict):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _flatten(f"{prefix}.{k}" if prefix else k, v, into)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        into[prefix] = value
+
+
+def compare_reports(old_path: str, new_path: str):
+    """Print the numeric differences between two reports, matched by result name."""
+    with open(old_path, encoding="utf-8") as f:
+        old = {r["name"]: r for r in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = {r["name"]: r for r in json.load(f)["results"]}
+
+    for name in sorted(set(old) | set(new)):
+        if name not in old or name not in new:
+            print(f"\n{name}: only in {'new' if name in new else 'old'} report")
+            continue
+        before, after = {}, {}
+        _flatten("", {k: v for k, v in old[name].items() if k != "config"}, before)
+        _flatten("", {k: v for k, v in new[name].items() if k != "config"}, after)
+        print(f"\n{name}")
+        for key in sorted(set(before) & set(after)):
+            a, b = before[key], after[key]
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"  {key:<32} {a:>12.4g} → {b:>12.4g}  ({change})")
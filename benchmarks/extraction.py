@@ -0,0 +1,150 @@
+# benchmarks/extraction.py
+"""
+DOCX extraction: the streaming lxml extractor vs the former python-docx path.
+
+Generates synthetic regulation-like documents (headings, article paragraphs
+and fee tables) with python-docx, or takes real files with ``--files``, and
+extracts each one with both extractors. Every run happens in a fresh process,
+so the peak RSS it reports is that extraction's own (lxml allocates outside
+the Python heap, where tracemalloc cannot see it).
+
+    python -m benchmarks.extraction --paragraphs 2000 20000 100000
+    python -m benchmarks.extraction --files data/*.docx --out docx.json
+"""
+import os
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def extract_python_docx(path: str) -> str:
+    """The extractor used before the streaming one: paragraphs only."""
+    from docx import Document
+
+    doc = Document(path)
+    return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
+
+
+def extract_streaming(path: str) -> str:
+    from rag.file_converter import extract_text_from_docx
+
+    return extract_text_from_docx(path)
+
+
+EXTRACTORS = {"python-docx": extract_python_docx, "lxml-stream": extract_streaming}
+
+
+def synthetic_docx(path: str, paragraphs: int, table_every: int, seed: int):
+    """A document of *paragraphs* article paragraphs, a heading every 20 and a
+    5x4 table every *table_every*."""
+    import random
+    from docx import Document
+
+    rng = random.Random(seed)
+    words = ["الطالب", "التسجيل", "الجامعة", "المنحة", "الإقامة", "الشهادة", "الطور", "المؤسسة",
+             "الوزارة", "الملف", "الأجل", "التقييم", "الانتقال", "السنة", "الدراسة", "الحق"]
+    doc = Document()
+    doc.add_heading("قرار يحدد كيفيات التسجيل", 0)
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            doc.add_heading(f"الفصل {i // 20 + 1}", 1)
+        body = " ".join(rng.choice(words) for _ in range(rng.randint(20, 60)))
+        doc.add_paragraph(f"المادة {i + 1}: {body}")
+        if table_every and i % table_every == table_every - 1:
+            table = doc.add_table(rows=5, cols=4)
+            for c, label in enumerate(["الطور", "المبلغ", "الأجل", "الملاحظة"]):
+                table.cell(0, c).text = label
+            for r in range(1, 5):
+                for c in range(4):
+                    table.cell(r, c).text = f"{rng.choice(words)} {rng.randint(1, 9999)}"
+    doc.save(path)
+
+
+def _peak_rss_kb() -> int:
+    """Peak RSS of this process. ru_maxrss survives exec on Linux (a spawned
+    child starts at its parent's peak), so VmHWM is preferred."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(extractor: str, path: str) -> dict:
+    """Run in a fresh process: time one extraction and its peak RSS growth."""
+    import docx  # noqa: F401  imported up front so module loading is not counted
+    import rag.file_converter  # noqa: F401
+
+    fn = EXTRACTORS[extractor]
+    before = _peak_rss_kb()
+    start = time.perf_counter()
+    text = fn(path)
+    seconds = time.perf_counter() - start
+    peak = _peak_rss_kb()
+    return {
+        "seconds": seconds,
+        "peak_rss_growth_mb": round((peak - before) / 1024, 1),
+        "chars": len(text),
+        "lines": text.count("\n") + 1 if text else 0,
+        "table_rows": sum(1 for line in text.split("\n") if " | " in line),
+    }
+
+
+def measure(extractor: str, path: str) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_measure, extractor, path).result()
+
+
+def main():
+    from benchmarks.common import latency_summary, report_meta, write_report
+
+    parser = argparse.ArgumentParser(description="Streaming vs python-docx DOCX extraction")
+    parser.add_argument("--files", nargs="+", help="real DOCX files to extract instead of synthetic ones")
+    parser.add_argument("--paragraphs", nargs="+", type=int, default=[2000, 20000],
+                        help="sizes of the synthetic documents")
+    parser.add_argument("--table-every", type=int, default=10, help="paragraphs between tables (0: none)")
+    parser.add_argument("--extractors", nargs="+", default=list(EXTRACTORS), choices=list(EXTRACTORS))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per file and extractor")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = args.files or []
+        for n in ([] if args.files else args.paragraphs):
+            path = os.path.join(tmp, f"synthetic-{n}.docx")
+            print(f"📝 Generating {path} ({n} paragraphs)")
+            synthetic_docx(path, n, args.table_every, args.seed)
+            files.append(path)
+
+        results = []
+        for path in files:
+            size_mb = round(os.path.getsize(path) / 2**20, 2)
+            for extractor in args.extractors:
+                print(f"⏱️  {extractor} on {os.path.basename(path)} ({size_mb} MiB)")
+                runs = [measure(extractor, path) for _ in range(args.repeat)]
+                last = runs[-1]
+                results.append({
+                    "name": f"extractor={extractor}|file={os.path.basename(path)}",
+                    "config": {"extractor": extractor, "file": path, "size_mb": size_mb},
+                    "output": {k: last[k] for k in ("chars", "lines", "table_rows")},
+                    "latency_ms": latency_summary([r["seconds"] for r in runs]),
+                    "peak_rss_growth_mb": max(r["peak_rss_growth_mb"] for r in runs),
+                })
+
+    report = {
+        "meta": report_meta(benchmark="extraction", repeat=args.repeat),
+        "results": results,
+    }
+    write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/hierarchical.py
+"""
+Flat vs hierarchical (document-centroid) search at corpus sizes the fixture
+corpus cannot reach.
+
+Builds a synthetic store of clustered vectors, each cluster standing in for
+one document, and queries it with perturbed chunk vectors. Flat search is the
+ground truth: recall@k is the share of its top-k that hierarchical search also
+returns, next to the query latency of each mode. No embedding model is needed.
+
+    python -m benchmarks.hierarchical --documents 200 --chunks-per-doc 500 --top-docs 1 3 10
+    python -m benchmarks.retrieval compare flat.json hier.json
+"""
+import time
+import argparse
+
+import numpy as np
+
+
+def synthetic_store(documents: int, chunks_per_doc: int, dimension: int, metric: str, seed: int):
+    """Store with *documents* clusters of *chunks_per_doc* vectors around random centres."""
+    from rag.vector_store import VectorStore
+
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((documents, dimension)).astype("float32")
+    vectors = np.repeat(centres, chunks_per_doc, axis=0)
+    vectors += 0.6 * rng.standard_normal(vectors.shape).astype("float32")
+    metadata = [
+        {"content": f"doc {d} chunk {c}", "source": f"doc-{d:05d}"}
+        for d in range(documents) for c in range(chunks_per_doc)
+    ]
+    store = VectorStore(dimension, metric=metric)
+    store.add(vectors, metadata)
+    return store, vectors
+
+
+def time_queries(store, queries: np.ndarray, top_k: int, top_docs, repeat: int) -> tuple:
+    store.search_batch(queries[:1], top_k, top_docs=top_docs)  # warm-up, builds centroids
+    latencies, ids = [], []
+    for query in queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            hits = store.search_batch(query.reshape(1, -1), top_k, top_docs=top_docs)[0]
+            latencies.append(time.perf_counter() - start)
+        ids.append({hit["id"] for hit in hits})
+    return latencies, ids
+
+
+def main():
+    from benchmarks.common import latency_summary, rss_mb, report_meta, write_report
+
+    parser = argparse.ArgumentParser(description="Flat vs hierarchical search on synthetic data")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--chunks-per-doc", type=int, default=250)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--metric", default="cosine", choices=["l2", "cosine"])
+    parser.add_argument("--top-docs", nargs="+", type=int, default=[1, 3, 10])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    store, vectors = synthetic_store(args.documents, args.chunks_per_doc, args.dimension, args.metric, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    picked = rng.choice(len(vectors), size=args.queries, replace=False)
+    queries = vectors[picked] + 0.3 * rng.standard_normal((args.queries, args.dimension)).astype("float32")
+
+    start = time.perf_counter()
+    store._ensure_centroids()
+    centroid_seconds = time.perf_counter() - start
+
+    config = {"documents": args.documents, "chunks": store.ntotal, "dimension": args.dimension,
+              "metric": args.metric, "top_k": args.top_k}
+    results = []
+    flat_ids = None
+    for top_docs in [None] + args.top_docs:
+        name = "retrieval=flat" if top_docs is None else f"retrieval=hierarchical|top_docs={top_docs}"
+        print(f"⏱️  {name}")
+        latencies, ids = time_queries(store, queries, args.top_k, top_docs, args.repeat)
+        if flat_ids is None:
+            flat_ids = ids
+        overlap = [len(got & want) / max(len(want), 1) for got, want in zip(ids, flat_ids)]
+        results.append({
+            "name": name,
+            "config": dict(config, top_docs=top_docs),
+            "quality": {f"recall@{args.top_k}_vs_flat": round(sum(overlap) / len(overlap), 4)},
+            "latency_ms": latency_summary(latencies),
+        })
+
+    report = {
+        "meta": report_meta(
+            benchmark="hierarchical",
+            centroid_build_seconds=round(centroid_seconds, 4),
+            rss_mb=rss_mb(),
+            queries=args.queries,
+            repeat=args.repeat,
+        ),
+        "results": results,
+    }
+    write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
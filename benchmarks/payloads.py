@@ -0,0 +1,172 @@
+# benchmarks/payloads.py
+"""
+Conversation payloads: the former Pydantic path vs the msgspec fast path,
+with and without response compression.
+
+Builds a conversation of ``--messages`` messages (long Arabic Markdown
+answers), then serves it from an in-process FastAPI app through two routes:
+``current`` (dict rows, ``response_model`` validation and standard JSON, as
+``get_conversation`` used to) and ``fast`` (tuple rows and msgspec Structs,
+see backend.payloads). Requests are driven straight through ASGI, so no
+server or database is needed; the time is the framework + serialization +
+compression cost of one request, and the size is the body on the wire.
+
+    python -m benchmarks.payloads --messages 20 200 --encodings identity gzip br
+"""
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import datetime
+
+_WORDS = ("الطالب التسجيل الجامعة المنحة الإقامة الشهادة الطور المؤسسة الوزارة الملف "
+          "الأجل التقييم الانتقال السنة الدراسة الحق المادة القرار").split()
+
+
+def synthetic_rows(messages: int, answer_chars: int, seed: int) -> list:
+    """``(id, is_user, content, created_at)`` rows, newest first."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    rows = []
+    for i in range(messages):
+        is_user = i % 2 == 0
+        if is_user:
+            content = " ".join(rng.choice(_WORDS) for _ in range(12)) + "؟"
+        else:
+            parts = ["## مقدمة\n"]
+            while sum(len(p) for p in parts) < answer_chars:
+                parts.append(f"- **المادة {rng.randint(1, 99)}**: " + " ".join(rng.choice(_WORDS) for _ in range(20)) + "\n")
+            parts.append("## خلاصة\n" + " ".join(rng.choice(_WORDS) for _ in range(30)))
+            content = "".join(parts)
+        rows.append((str(uuid.UUID(int=rng.getrandbits(128))), is_user, content,
+                     start + datetime.timedelta(seconds=37 * i, microseconds=rng.randint(0, 999999))))
+    rows.reverse()
+    return rows
+
+
+def build_app(rows: list, compression: bool):
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+    from backend.payloads import MsgspecResponse, conversation_detail
+    from backend.compression import CompressionMiddleware
+
+    # The models and row handling get_conversation used before the fast path
+    class MessageResponse(BaseModel):
+        id: str
+        is_user: bool
+        content: str
+        created_at: str
+
+    class ConversationDetailResponse(BaseModel):
+        id: str
+        title: str
+        messages: list[MessageResponse]
+
+    columns = ("id", "is_user", "content", "created_at")
+    dict_rows = [dict(zip(columns, row)) for row in rows]
+    app = FastAPI()
+    if compression:
+        app.add_middleware(CompressionMiddleware)
+
+    @app.get("/current", response_model=ConversationDetailResponse)
+    async def current():
+        messages_list = []
+        for msg in dict_rows:
+            messages_list.append({
+                "id": msg['id'],
+                "is_user": bool(msg['is_user']),
+                "content": msg['content'],
+                "created_at": str(msg['created_at']),
+            })
+        return ConversationDetailResponse(id="c", title="محادثة", messages=messages_list)
+
+    @app.get("/fast")
+    async def fast():
+        return MsgspecResponse(conversation_detail("c", "محادثة", rows))
+
+    return app
+
+
+async def asgi_get(app, path: str, accept_encoding: str) -> tuple:
+    """(status, headers, body) of a GET request sent straight to *app*."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench"), (b"accept-encoding", accept_encoding.encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    received = False
+    response = {"body": b""}
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.sleep(3600)
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["headers"], response["body"]
+
+
+async def time_route(app, path: str, encoding: str, repeat: int) -> tuple:
+    await asgi_get(app, path, encoding)  # warm-up
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        status, headers, body = await asgi_get(app, path, encoding)
+        latencies.append(time.perf_counter() - start)
+    assert status == 200, status
+    return latencies, len(body), headers.get(b"content-encoding", b"identity").decode()
+
+
+def main():
+    from benchmarks.common import latency_summary, report_meta, write_report
+    from backend.compression import brotli
+
+    parser = argparse.ArgumentParser(description="Pydantic vs msgspec conversation payloads, with compression")
+    parser.add_argument("--messages", nargs="+", type=int, default=[20, 200])
+    parser.add_argument("--answer-chars", type=int, default=3000, help="length of each assistant answer")
+    parser.add_argument("--encodings", nargs="+", default=["identity", "gzip", "br"],
+                        help="Accept-Encoding values to request")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    encodings = [e for e in args.encodings if e != "br" or brotli is not None]
+    if encodings != args.encodings:
+        print("⚠️  brotli is not installed; skipping br")
+
+    results = []
+    for messages in args.messages:
+        rows = synthetic_rows(messages, args.answer_chars, args.seed)
+        apps = {False: build_app(rows, compression=False), True: build_app(rows, compression=True)}
+        for path in ("current", "fast"):
+            for encoding in encodings:
+                name = f"path={path}|messages={messages}|encoding={encoding}"
+                print(f"⏱️  {name}")
+                app = apps[encoding != "identity"]
+                latencies, size, used = asyncio.run(time_route(app, f"/{path}", encoding, args.repeat))
+                results.append({
+                    "name": name,
+                    "config": {"path": path, "messages": messages, "answer_chars": args.answer_chars,
+                               "accept_encoding": encoding, "content_encoding": used},
+                    "latency_ms": latency_summary(latencies),
+                    "body_kb": round(size / 1024, 1),
+                })
+
+    report = {"meta": report_meta(benchmark="payloads", repeat=args.repeat), "results": results}
+    write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
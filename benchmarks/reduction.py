@@ -0,0 +1,124 @@
+# benchmarks/reduction.py
+"""
+Recall, search speed and index size of PCA / OPQ reduced stores.
+
+Takes the vectors of an existing store (``--store``), a ``.npy`` matrix
+(``--vectors``) or, by default, synthetic embedding-like vectors whose
+variance decays over the dimensions, as real sentence embeddings do. For
+each method and target dimension a reduced store is fitted on the same
+vectors; full-width exact search is the ground truth. Queries are stored
+vectors with a little noise added.
+
+    python -m benchmarks.reduction --dims 32 64 128 192 --methods pca opq
+    python -m benchmarks.reduction --store vector_store --dims 64 128 --out reduction.json
+"""
+import time
+import argparse
+
+import faiss
+import numpy as np
+
+
+def synthetic_vectors(count: int, dimension: int, decay: float, seed: int) -> np.ndarray:
+    """Gaussian vectors with a power-law variance spectrum in a random basis."""
+    rng = np.random.default_rng(seed)
+    basis, _ = np.linalg.qr(rng.standard_normal((dimension, dimension)))
+    scale = np.arange(1, dimension + 1) ** -decay
+    return ((rng.standard_normal((count, dimension)) * scale) @ basis).astype("float32")
+
+
+def store_vectors(path: str) -> tuple:
+    from rag.sharded_store import load_store, ShardedVectorStore
+
+    store = load_store(path)
+    shards = store.shards.values() if isinstance(store, ShardedVectorStore) else [store]
+    return np.vstack([shard.index.reconstruct_n(0, shard.ntotal) for shard in shards]), store.metric
+
+
+def time_queries(store, queries: np.ndarray, top_k: int, repeat: int) -> tuple:
+    store.search_batch(queries[:1], top_k)  # warm-up
+    latencies, ids = [], []
+    for query in queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            hits = store.search_batch(query.reshape(1, -1), top_k)[0]
+            latencies.append(time.perf_counter() - start)
+        ids.append({hit["id"] for hit in hits})
+    return latencies, ids
+
+
+def main():
+    from benchmarks.common import latency_summary, rss_mb, report_meta, write_report
+    from rag.vector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description="Recall vs speed vs memory of reduced stores")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--store", help="benchmark the vectors of this store")
+    source.add_argument("--vectors", help="benchmark the vectors of this .npy file")
+    parser.add_argument("--count", type=int, default=50000, help="synthetic vectors")
+    parser.add_argument("--dimension", type=int, default=384, help="synthetic vector width")
+    parser.add_argument("--decay", type=float, default=0.5, help="synthetic variance decay exponent")
+    parser.add_argument("--metric", default="cosine", choices=["l2", "cosine"])
+    parser.add_argument("--methods", nargs="+", default=["pca", "opq"], choices=["pca", "opq"])
+    parser.add_argument("--dims", nargs="+", type=int, default=[32, 64, 128, 192])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.1, help="query noise, relative to the vector norm")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    metric = args.metric
+    if args.store:
+        vectors, metric = store_vectors(args.store)
+    elif args.vectors:
+        vectors = np.load(args.vectors).astype("float32")
+    else:
+        vectors = synthetic_vectors(args.count, args.dimension, args.decay, args.seed)
+    metadata = [{"content": ""} for _ in range(len(vectors))]
+
+    rng = np.random.default_rng(args.seed + 1)
+    picked = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    norms = np.linalg.norm(vectors[picked], axis=1, keepdims=True)
+    noise = rng.standard_normal((len(picked), vectors.shape[1])).astype("float32")
+    queries = vectors[picked] + args.noise * norms * noise / np.sqrt(vectors.shape[1])
+
+    config = {"vectors": len(vectors), "dimension": vectors.shape[1], "metric": metric, "top_k": args.top_k}
+    results = []
+    exact_ids = None
+    for method, dim in [(None, None)] + [(m, d) for m in args.methods for d in args.dims]:
+        name = "reduction=none" if method is None else f"reduction={method}|dim={dim}"
+        store = VectorStore(vectors.shape[1], metric=metric)
+        store.add(vectors, metadata)
+        fit_seconds = 0.0
+        if method is not None:
+            if dim >= vectors.shape[1]:
+                continue
+            print(f"📉 Fitting {name}")
+            start = time.perf_counter()
+            store.reduce(dim, method)
+            fit_seconds = time.perf_counter() - start
+        print(f"⏱️  {name}")
+        latencies, ids = time_queries(store, queries, args.top_k, args.repeat)
+        if exact_ids is None:
+            exact_ids = ids
+        overlap = [len(got & want) / max(len(want), 1) for got, want in zip(ids, exact_ids)]
+        results.append({
+            "name": name,
+            "config": dict(config, reduction=method or "none", reduced_dim=dim),
+            "quality": {f"recall@{args.top_k}": round(sum(overlap) / len(overlap), 4)},
+            "latency_ms": latency_summary(latencies),
+            "index_mb": round(len(faiss.serialize_index(store.index)) / 2**20, 2),
+            "fit_seconds": round(fit_seconds, 3),
+        })
+
+    report = {
+        "meta": report_meta(benchmark="reduction", rss_mb=rss_mb(), queries=len(queries), repeat=args.repeat),
+        "results": results,
+    }
+    write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# benchmarks/retrieval.py
+"""
+Retrieval quality and latency benchmark.
+
+Builds a store from the fixture corpus for every combination of embedding
+model, index metric, sharding mode, chunk size and retrieval mode (flat or
+hierarchical), runs the labelled questions through
+``retrieve_relevant_chunks`` and reports recall@k, MRR, query latency,
+indexing throughput and memory as JSON.
+
+    python -m benchmarks.retrieval run --out before.json
+    python -m benchmarks.retrieval run --chunk-sizes 300 500 --metrics l2 cosine --out after.json
+    python -m benchmarks.retrieval run --retrieval-modes flat hierarchical --top-docs 1 2
+    python -m benchmarks.retrieval compare before.json after.json
+
+Models are loaded from the local Hugging Face cache only (offline), unless
+``--online`` is given.
+"""
+import os
+import json
+import time
+import argparse
+import itertools
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_questions(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_relevant(chunk: str, question: dict) -> bool:
+    return any(expected in chunk for expected in question["expected"])
+
+
+def build_store(corpus_dir: str, config: dict):
+    """Ingest, chunk, embed and index the corpus for one configuration."""
+    from rag.ingestion import ingest_documents
+    from rag.chunking import chunk_document
+    from rag.embedder import embed_chunks
+    from rag.vector_store import VectorStore
+    from rag.sharded_store import ShardedVectorStore
+
+    texts = ingest_documents(corpus_dir)
+    documents = []
+    for filename, txt in texts:
+        documents.extend(chunk_document(filename, txt, config["chunk_size"]))
+    chunks = [doc["content"] for doc in documents]
+
+    start = time.perf_counter()
+    vectors = embed_chunks(chunks, model_name=config["model"])
+    embed_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if config.get("shard_by", "none") != "none":
+        store = ShardedVectorStore(len(vectors[0]), shard_by=config["shard_by"],
+                                   max_shard_size=config.get("shard_size", 50000),
+                                   metric=config["metric"], model_name=config["model"])
+    else:
+        store = VectorStore(dimension=len(vectors[0]), metric=config["metric"], model_name=config["model"])
+    store.add(vectors, documents)
+    index_seconds = time.perf_counter() - start
+
+    stats = {
+        "documents": len(texts),
+        "chunks": len(chunks),
+        "embed_seconds": round(embed_seconds, 4),
+        "index_seconds": round(index_seconds, 4),
+        "chunks_per_second": round(len(chunks) / (embed_seconds + index_seconds), 2),
+        "index_bytes": store.ntotal * store.dimension * 4,
+    }
+    return store, stats
+
+
+def evaluate(store, questions: list, top_ks: list, repeat: int, top_docs: int | None = None) -> tuple:
+    from rag.retriever import retrieve_relevant_chunks
+
+    max_k = max(top_ks)
+    retrieve_relevant_chunks(store, questions[0]["question"], top_k=max_k, top_docs=top_docs)  # warm-up
+
+    hits_at = {k: 0 for k in top_ks}
+    reciprocal_ranks = []
+    latencies = []
+    for question in questions:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            chunks = retrieve_relevant_chunks(store, question["question"], top_k=max_k, top_docs=top_docs)
+            latencies.append(time.perf_counter() - start)
+
+        rank = next((i for i, ch in enumerate(chunks, 1) if is_relevant(ch, question)), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        for k in top_ks:
+            if rank and rank <= k:
+                hits_at[k] += 1
+
+    quality = {f"recall@{k}": round(hits_at[k] / len(questions), 4) for k in top_ks}
+    quality["mrr"] = round(sum(reciprocal_ranks) / len(questions), 4)
+    return quality, latencies
+
+
+def run(args):
+    from benchmarks.common import latency_summary, rss_mb, quiet, report_meta, write_report
+
+    if not args.online:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    questions = load_questions(args.questions)
+    results = []
+    # Flat search and each hierarchical document limit share one built store
+    modes = [None if mode == "flat" else top_docs
+             for mode in args.retrieval_modes
+             for top_docs in ([None] if mode == "flat" else args.top_docs)]
+    for model, metric, shard_by, chunk_size in itertools.product(
+            args.models, args.metrics, args.shard_by, args.chunk_sizes):
+        config = {"model": model, "metric": metric, "shard_by": shard_by, "chunk_size": chunk_size}
+        if shard_by == "size":
+            config["shard_size"] = args.shard_size
+        with quiet(not args.verbose):
+            store, index_stats = build_store(args.corpus, config)
+        index_stats["rss_mb"] = rss_mb()
+
+        for top_docs in modes:
+            mode_config = dict(config, retrieval="flat" if top_docs is None else "hierarchical")
+            if top_docs is not None:
+                mode_config["top_docs"] = top_docs
+            name = "|".join(f"{k}={v}" for k, v in mode_config.items())
+            print(f"⏱️  {name}")
+
+            with quiet(not args.verbose):
+                quality, latencies = evaluate(store, questions, args.top_k, args.repeat, top_docs)
+
+            results.append({
+                "name": name,
+                "config": mode_config,
+                "index": index_stats,
+                "quality": quality,
+                "latency_ms": latency_summary(latencies),
+            })
+
+    report = {
+        "meta": report_meta(
+            benchmark="retrieval",
+            corpus=args.corpus,
+            questions=len(questions),
+            repeat=args.repeat,
+        ),
+        "results": results,
+    }
+    write_report(report, args.out)
+
+
+def main():
+    from rag.settings import EMBEDDING_MODEL_NAME, CHUNK_SIZE
+    from benchmarks.common import compare_reports
+
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the benchmark matrix")
+    run_parser.add_argument("--corpus", default=os.path.join(FIXTURES, "corpus"))
+    run_parser.add_argument("--questions", default=os.path.join(FIXTURES, "questions.jsonl"))
+    run_parser.add_argument("--models", nargs="+", default=[EMBEDDING_MODEL_NAME])
+    run_parser.add_argument("--metrics", nargs="+", default=["l2", "cosine"], choices=["l2", "cosine"])
+    run_parser.add_argument("--shard-by", nargs="+", default=["none"],
+                            choices=["none", "source", "doc_type", "size"])
+    run_parser.add_argument("--shard-size", type=int, default=8, help="vectors per shard for --shard-by size")
+    run_parser.add_argument("--chunk-sizes", nargs="+", type=int, default=[250, CHUNK_SIZE, 1000])
+    run_parser.add_argument("--retrieval-modes", nargs="+", default=["flat"], choices=["flat", "hierarchical"])
+    run_parser.add_argument("--top-docs", nargs="+", type=int, default=[2],
+                            help="documents searched per query in hierarchical mode")
+    run_parser.add_argument("--top-k", nargs="+", type=int, default=[1, 3, 5])
+    run_parser.add_argument("--repeat", type=int, default=5, help="timed runs per question")
+    run_parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    run_parser.add_argument("--online", action="store_true", help="allow model downloads")
+    run_parser.add_argument("--verbose", action="store_true", help="keep pipeline output")
+
+    compare_parser = sub.add_parser("compare", help="diff two reports")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        compare_reports(args.old, args.new)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# loadtest/build_store.py
+"""
+Build a vector store from the benchmark fixture corpus so the API can be
+started for load tests without the real data directory.
+
+    python -m loadtest.build_store --out /tmp/loadtest-store
+    VECTOR_STORE_PATH=/tmp/loadtest-store LLM_BACKEND=fake uvicorn backend.api:app
+"""
+import os
+import argparse
+from benchmarks.retrieval import FIXTURES, build_store
+from rag.settings import EMBEDDING_MODEL_NAME, CHUNK_SIZE, VECTOR_METRIC, SHARD_BY, SHARD_MAX_VECTORS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a fixture vector store for load tests")
+    parser.add_argument("--out", default="/tmp/loadtest-store")
+    parser.add_argument("--corpus", default=os.path.join(FIXTURES, "corpus"))
+    args = parser.parse_args()
+
+    store, stats = build_store(args.corpus, {
+        "model": EMBEDDING_MODEL_NAME, "metric": VECTOR_METRIC, "chunk_size": CHUNK_SIZE,
+        "shard_by": SHARD_BY, "shard_size": SHARD_MAX_VECTORS,
+    })
+    store.save(args.out)
+    print(f"✅ {stats['chunks']} chunks from {stats['documents']} documents saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# loadtest/run.py
+"""
+End-to-end load test for backend/api.py.
+
+Each virtual user signs up and logs in, then loops over a weighted mix of
+asking questions (conversation creation, streamed answer, saving the AI
+message), reading history, checking the session and logging in again.
+The run is repeated at increasing concurrency levels and reports throughput,
+time-to-first-token and per-endpoint tail latency for each level as JSON.
+
+Start the stand-ins and the API first (see the "Load testing" section of the
+readme), then:
+
+    python -m loadtest.run --base-url http://localhost:8000 --concurrency 1 8 32 64 --out load.json
+    python -m benchmarks.retrieval compare load-before.json load-after.json
+"""
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import defaultdict
+
+import requests
+
+from benchmarks.common import latency_summary, report_meta, write_report
+from benchmarks.retrieval import FIXTURES
+
+DEFAULT_MIX = {"ask": 5, "history": 3, "session": 1, "login": 1}
+
+
+class Recorder:
+    """Thread-safe collection of request timings for one concurrency level."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.ttft = []
+        self.answers = 0
+
+    def record(self, label: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+
+    def record_stream(self, ttft: float | None, total: float, ok: bool):
+        with self._lock:
+            self.latencies["POST /api/stream-answer"].append(total)
+            if ttft is not None:
+                self.ttft.append(ttft)
+            if ok:
+                self.answers += 1
+            else:
+                self.errors["POST /api/stream-answer"] += 1
+
+
+class VirtualUser:
+    def __init__(self, base_url: str, questions: list, recorder: Recorder, mix: dict, seed: int):
+        self.base_url = base_url.rstrip("/")
+        self.questions = questions
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+        self.actions = list(mix)
+        self.weights = [mix[a] for a in self.actions]
+        self.http = requests.Session()
+        self.email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        self.password = uuid.uuid4().hex
+        self.conversation_id = None
+
+    def _call(self, method: str, path: str, label: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=120, **kwargs)
+            ok = response.ok
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(label, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def signup(self):
+        self._call("POST", "/api/signup", "POST /api/signup",
+                   json={"name": "Load Test", "email": self.email, "password": self.password})
+
+    def login(self):
+        self._call("POST", "/api/login", "POST /api/login",
+                   json={"email": self.email, "password": self.password})
+
+    def session(self):
+        self._call("GET", "/api/session", "GET /api/session")
+
+    def history(self):
+        response = self._call("GET", "/api/conversations", "GET /api/conversations")
+        if response is not None and response.json()["conversations"]:
+            conversation = self.rng.choice(response.json()["conversations"])
+            self._call("GET", f"/api/conversations/{conversation['id']}", "GET /api/conversations/{id}")
+
+    def ask(self):
+        if self.conversation_id is None or self.rng.random() < 0.3:
+            response = self._call("POST", "/api/conversations", "POST /api/conversations", json={})
+            if response is None:
+                return
+            self.conversation_id = response.json()["id"]
+
+        question = self.rng.choice(self.questions)["question"]
+        start = time.perf_counter()
+        ttft, parts, ok = None, [], False
+        try:
+            with self.http.post(
+                f"{self.base_url}/api/stream-answer/{self.conversation_id}/messages",
+                json={"message": question}, stream=True, timeout=300,
+            ) as response:
+                ok = response.ok
+                for piece in response.iter_content(chunk_size=None):
+                    if piece and ttft is None:
+                        ttft = time.perf_counter() - start
+                    parts.append(piece)
+        except requests.RequestException:
+            ok = False
+        self.recorder.record_stream(ttft, time.perf_counter() - start, ok)
+
+        answer = b"".join(parts).decode("utf-8", errors="replace").strip()
+        if ok and answer:
+            self._call("POST", f"/api/stream-answer/{self.conversation_id}/ai-message",
+                       "POST /api/stream-answer/ai-message", json={"message": answer})
+
+    def run(self, deadline: float):
+        self.signup()
+        self.login()
+        while time.perf_counter() < deadline:
+            action = self.rng.choices(self.actions, self.weights)[0]
+            getattr(self, action)()
+
+
+def run_level(args, questions: list, concurrency: int) -> dict:
+    recorder = Recorder()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    users = [
+        VirtualUser(args.base_url, questions, recorder, args.mix, seed=args.seed + i)
+        for i in range(concurrency)
+    ]
+    threads = []
+    for user in users:
+        thread = threading.Thread(target=user.run, args=(deadline,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp_up / max(concurrency, 1))
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total_requests = sum(len(v) for v in recorder.latencies.values())
+    return {
+        "name": f"concurrency={concurrency}",
+        "config": {"concurrency": concurrency, "duration": args.duration, "mix": args.mix},
+        "throughput": {
+            "requests_per_second": round(total_requests / elapsed, 2),
+            "answers_per_second": round(recorder.answers / elapsed, 2),
+            "error_rate": round(sum(recorder.errors.values()) / max(total_requests, 1), 4),
+        },
+        "ttft_ms": latency_summary(recorder.ttft),
+        "endpoints": {label: latency_summary(v) for label, v in sorted(recorder.latencies.items())},
+        "errors": dict(recorder.errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the FastAPI app")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 32])
+    parser.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    parser.add_argument("--ramp-up", type=float, default=2, help="seconds to start all users")
+    parser.add_argument("--questions", default=f"{FIXTURES}/questions.jsonl")
+    parser.add_argument("--mix", type=json.loads, default=DEFAULT_MIX,
+                        help='action weights as JSON, e.g. \'{"ask": 1, "history": 1}\'')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+
+    results = []
+    for concurrency in args.concurrency:
+        print(f"🚦 {concurrency} concurrent users for {args.duration:.0f}s…")
+        result = run_level(args, questions, concurrency)
+        print(f"   {result['throughput']['requests_per_second']} req/s, "
+              f"TTFT p95 {result['ttft_ms']['p95']} ms, "
+              f"errors {result['throughput']['error_rate']:.1%}")
+        results.append(result)
+
+    write_report({"meta": report_meta(benchmark="load", base_url=args.base_url), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
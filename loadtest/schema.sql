@@ -0,0 +1,37 @@
+-- Tables used by backend/api.py. Loaded automatically by docker-compose.yml
+-- into the local Postgres used for load tests.
+CREATE TABLE IF NOT EXISTS users (
+    id          TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    email       TEXT NOT NULL UNIQUE,
+    password    TEXT NOT NULL,
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS conversations (
+    id                TEXT PRIMARY KEY,
+    user_id           TEXT NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    title             TEXT NOT NULL DEFAULT 'New Conversation',
+    is_new            BOOLEAN NOT NULL DEFAULT TRUE,
+    is_title_changed  BOOLEAN NOT NULL DEFAULT FALSE,
+    summary           TEXT NOT NULL DEFAULT '',     -- rolling summary (MEMORY_MODE=summary)
+    summary_messages  INTEGER NOT NULL DEFAULT 0,   -- oldest messages folded into it
+    created_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at        TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Databases created before the rolling summary memory
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary TEXT NOT NULL DEFAULT '';
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary_messages INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS conversations_user_idx ON conversations (user_id, updated_at DESC);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id               TEXT PRIMARY KEY,
+    conversation_id  TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+    is_user          BOOLEAN NOT NULL,
+    content          TEXT NOT NULL,
+    created_at       TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS messages_conversation_idx ON messages (conversation_id, created_at);
@@ -1,19 +1,24 @@
 # Updated rag/agent.py
 import google.generativeai as genai
-from rag.settings import GEMINI_API_KEY
+from rag.settings import GEMINI_API_KEY, LLM_BACKEND
 
 # Configure Gemini API
 genai.configure(api_key=GEMINI_API_KEY)
 
-# Initialize Gemini Model
-model = genai.GenerativeModel('gemini-1.5-flash')
+# Initialize Gemini Model (or the local stand-in used for load tests)
+if LLM_BACKEND == "fake":
+    from rag.fake_llm import FakeGenerativeModel
+    model = FakeGenerativeModel()
+else:
+    model = genai.GenerativeModel('gemini-1.5-flash')
 
-def generate_answer(context_chunks: list, query: str, conversation_history: list) -> str:
+def generate_answer(context_chunks: list, query: str, conversation_history: list, summary: str = "") -> str:
     """
     Generate an Arabic answer based on retrieved context, user query, and conversation history.
+    *summary* condenses the turns older than *conversation_history* (see rag.memory).
     """
     # Build memory conversation text
-    memory_text = ""
+    memory_text = f"ملخص ما سبق من المحادثة: {summary}\n\n" if summary else ""
     for i, (past_query, past_answer) in enumerate(conversation_history[-10:], 1):
         memory_text += f"سؤال {i}: {past_query}\nإجابة {i}: {past_answer}\n\n"
 
@@ -65,12 +70,13 @@ def generate_answer(context_chunks: list, query: str, conversation_history: list
     return response.text.strip() if hasattr(response, 'text') else response.generations[0].text.strip()
 
 
-def build_prompt(context_chunks: list, query: str, conversation_history: list) -> str:
+def build_prompt(context_chunks: list, query: str, conversation_history: list, summary: str = "") -> str:
     """
     Generate an Arabic answer based on retrieved context, user query, and conversation history.
+    *summary* condenses the turns older than *conversation_history* (see rag.memory).
     """
     # Build memory conversation text
-    memory_text = ""
+    memory_text = f"ملخص ما سبق من المحادثة: {summary}\n\n" if summary else ""
     for i, (past_query, past_answer) in enumerate(conversation_history[-10:], 1):
         memory_text += f"سؤال {i}: {past_query}\nإجابة {i}: {past_answer}\n\n"
 
@@ -0,0 +1,146 @@
+# rag/batch.py
+"""
+Batch question answering over a JSONL file, for regression runs against the
+corpus and for pre-generating FAQ answers.
+
+Each input line holds a ``question`` and optionally an ``id`` (default: the
+line number) and ``filters`` (as for retrieval). All pending questions are
+embedded in one model call and searched with one FAISS call per distinct
+filter, then answers are generated on ``concurrency`` threads. Each result
+is appended to the output file as soon as it is ready:
+
+    {"id", "question", "answer", "chunks": [{"score", "source", "article", "text"}],
+     "timings_ms": {"embed", "search", "generate"}}
+
+``embed`` and ``search`` are the batch totals divided by the number of
+questions. A failed generation is written with an ``error`` field instead of
+an answer. Rerunning with the same output file skips the questions already
+answered and retries the failed ones, so an interrupted run can be resumed.
+
+    python -m rag.main --batch questions.jsonl --out answers.jsonl --concurrency 4
+"""
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from tqdm import tqdm
+
+from rag.agent import generate_answer
+from rag.embedder import get_embedder
+from rag.metadata import format_chunk
+from rag.retriever import _DEFAULT_TOP_DOCS
+from rag.settings import SCORE_THRESHOLD
+
+
+def read_questions(path: str) -> list:
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record.setdefault("id", str(n))
+            questions.append(record)
+    return questions
+
+
+def answered_ids(out_path: str) -> set:
+    """Ids answered without error in *out_path*. A line cut short by an
+    interruption is dropped, so new results start on a fresh line."""
+    if not os.path.exists(out_path):
+        return set()
+    with open(out_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    done = set()
+    for line in data[:end].decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if "error" not in record:
+            done.add(str(record["id"]))
+    return done
+
+
+def retrieve_batch(store, questions: list, top_k: int, score_threshold, top_docs) -> tuple:
+    """Chunks for every question, plus the embedding and search time in seconds."""
+    start = time.perf_counter()
+    texts = [q["question"] for q in questions]
+    vectors = np.asarray(get_embedder(store.model_name).encode(texts, batch_size=64), dtype="float32")
+    embed_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    groups: dict = {}
+    for i, q in enumerate(questions):
+        groups.setdefault(json.dumps(q.get("filters"), sort_keys=True), []).append(i)
+    hits = [None] * len(questions)
+    for key, rows in groups.items():
+        found = store.search_batch(vectors[rows], top_k, score_threshold, json.loads(key), top_docs)
+        for row, row_hits in zip(rows, found):
+            hits[row] = row_hits
+    search_seconds = time.perf_counter() - start
+    return hits, embed_seconds, search_seconds
+
+
+def _generate(question: str, context: list) -> tuple:
+    start = time.perf_counter()
+    answer = generate_answer(context, question, [])
+    return answer, time.perf_counter() - start
+
+
+def run_batch(store, in_path: str, out_path: str, concurrency: int = 4, top_k: int = 5,
+              score_threshold=SCORE_THRESHOLD, top_docs=_DEFAULT_TOP_DOCS):
+    questions = read_questions(in_path)
+    done = answered_ids(out_path)
+    pending = [q for q in questions if str(q["id"]) not in done]
+    print(f"\n📋 {len(questions)} questions, {len(questions) - len(pending)} already answered, {len(pending)} to go")
+    if not pending:
+        return
+
+    hits, embed_seconds, search_seconds = retrieve_batch(store, pending, top_k, score_threshold, top_docs)
+    print(f"🔎 Retrieved context in {embed_seconds:.2f}s (embedding) + {search_seconds:.2f}s (search)")
+    shared = {
+        "embed": round(embed_seconds * 1000 / len(pending), 3),
+        "search": round(search_seconds * 1000 / len(pending), 3),
+    }
+
+    failed = 0
+    with open(out_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-qa") as pool:
+        futures = {}
+        for q, q_hits in zip(pending, hits):
+            context = [format_chunk(hit["metadata"]) for hit in q_hits]
+            futures[pool.submit(_generate, q["question"], context)] = (q, q_hits)
+        try:
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Answering", unit="question"):
+                q, q_hits = futures[future]
+                record = {
+                    "id": q["id"],
+                    "question": q["question"],
+                    "chunks": [{
+                        "score": round(float(hit["score"]), 4),
+                        "source": hit["metadata"].get("source"),
+                        "article": hit["metadata"].get("article"),
+                        "text": format_chunk(hit["metadata"]),
+                    } for hit in q_hits],
+                }
+                try:
+                    answer, generate_seconds = future.result()
+                    record["answer"] = answer
+                    record["timings_ms"] = dict(shared, generate=round(generate_seconds * 1000, 3))
+                except Exception as e:
+                    failed += 1
+                    record["error"] = f"{type(e).__name__}: {e}"
+                    record["timings_ms"] = dict(shared)
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print("\n⏸️  Interrupted; rerun the same command to resume")
+            raise
+    print(f"✅ Wrote {len(pending) - failed} answers to {out_path}" + (f", {failed} failed (rerun to retry)" if failed else ""))
@@ -1,21 +1,68 @@
 # rag/chunking.py
+import re
 
 from tqdm import tqdm
 from rag.utils import clean_text, is_quality    
+from rag.metadata import document_metadata, find_articles
+
+# Heading lines written by the DOCX extractor ("## Title")
+_HEADING_RE = re.compile(r"^#{1,6} ")
+
 
 def chunk_text(text: str, chunk_size: int) -> list:
+    """Pack paragraphs into chunks of about *chunk_size* characters. A heading
+    always starts a new chunk and keeps its own line."""
     paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
     chunks = []
     current_chunk = ""
+    after_heading = False
 
     for para in tqdm(paragraphs, desc="Chunking paragraphs", unit="para"):
-        if len(current_chunk) + len(para) <= chunk_size:
-            current_chunk += " " + para
+        heading = bool(_HEADING_RE.match(para))
+        if heading and current_chunk and not after_heading:
+            chunks.append(current_chunk.strip())
+            current_chunk = para
+        elif after_heading or len(current_chunk) + len(para) <= chunk_size:
+            current_chunk += ("\n" if after_heading else " ") + para
         else:
             chunks.append(current_chunk.strip())
             current_chunk = para
+        after_heading = heading
 
     if current_chunk:
         chunks.append(current_chunk.strip())
 
     return chunks
+
+
+def chunk_document(filename: str, text: str, chunk_size: int) -> list:
+    """
+    Chunk one document and attach its metadata to every chunk.
+
+    Each chunk records the articles it contains; a chunk that continues an
+    article started in an earlier chunk is attributed to that article. It
+    also records the last heading seen at or before its start ("section").
+    """
+    doc_meta = document_metadata(filename, text)
+    chunks = []
+    current_article = None
+    section = None
+    for ch in chunk_text(text, chunk_size):
+        lines = ch.split("\n")
+        while len(lines) > 1 and _HEADING_RE.match(lines[0]):
+            section = lines.pop(0).lstrip("#").strip()
+        body = lines[0]
+        articles = find_articles(ch)
+        if current_article is not None and not body.startswith("المادة"):
+            articles.insert(0, current_article)  # continues the previous article
+        articles = list(dict.fromkeys(articles))
+        if articles:
+            current_article = articles[-1]
+        chunks.append({
+            "content": ch,
+            **doc_meta,
+            "article": articles[0] if articles else None,
+            "articles": articles,
+            "section": section,
+        })
+    return chunks
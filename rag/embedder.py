@@ -1,15 +1,44 @@
 # rag/embedder.py
 
+import threading
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer
 from rag.settings import EMBEDDING_MODEL_NAME
+from rag.metrics import record_cache
 
-embedder = SentenceTransformer(EMBEDDING_MODEL_NAME)
+_embedders: dict = {}
+_load_lock = threading.Lock()
 
-def embed_chunks(chunks: list) -> list:
-    embeddings = []
-    print(f"\n🧠 Embedding {len(chunks)} chunks...")
-    for chunk in tqdm(chunks, desc="Generating embeddings", unit="chunk"):
-        embedding = embedder.encode(chunk)
-        embeddings.append(embedding)
+
+def get_embedder(model_name: str | None = None):
+    """Load a SentenceTransformer on first use so processes that delegate
+    embedding to the sidecar never hold their own copy of the model."""
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    if model_name not in _embedders:
+        # Worker threads may ask at the same time; load each model once
+        with _load_lock:
+            if model_name not in _embedders:
+                from sentence_transformers import SentenceTransformer
+                _embedders[model_name] = SentenceTransformer(model_name)
+    return _embedders[model_name]
+
+
+def embed_chunks(chunks: list, model_name: str | None = None, cache=None) -> list:
+    """Embed *chunks*; with an EmbeddingCache, only chunks it does not hold yet
+    are sent to the model, and their vectors are added to it."""
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    embeddings = cache.get_many(model_name, chunks) if cache is not None else [None] * len(chunks)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if cache is not None:
+        record_cache("embedding", True, len(chunks) - len(missing))
+        record_cache("embedding", False, len(missing))
+        print(f"\n💾 Embedding cache: {len(chunks) - len(missing)} hits, {len(missing)} misses")
+    if not missing:
+        return embeddings
+
+    embedder = get_embedder(model_name)
+    print(f"\n🧠 Embedding {len(missing)} chunks...")
+    for i in tqdm(missing, desc="Generating embeddings", unit="chunk"):
+        embeddings[i] = embedder.encode(chunks[i])
+    if cache is not None:
+        cache.put_many(model_name, [chunks[i] for i in missing], [embeddings[i] for i in missing])
     return embeddings
@@ -0,0 +1,182 @@
+# rag/embedding_cache.py
+"""
+Persistent cache of chunk embeddings, so a rebuild only embeds new text.
+
+Changing CHUNK_SIZE, a cleanup rule or the store layout reshapes the store,
+but most chunk texts come out the same. Vectors are keyed by the SHA-256 of
+(model name, chunk text) and kept in one float32 memory-mapped file per
+dimension (``vectors-<dim>.f32``, fixed-size slots); a SQLite index maps each
+key to its slot and last use. When the cache would exceed ``max_bytes`` the
+least recently used entries are evicted and their slots reused, so the
+vector files never grow past the budget.
+
+Evictions are committed before their slots are overwritten and new entries
+only after their vectors are flushed, so an interrupted run never leaves the
+index pointing at the wrong vector.
+"""
+import os
+import sqlite3
+import hashlib
+
+import numpy as np
+
+from rag.settings import EMBEDDING_CACHE, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB
+
+# SQLite caps the number of bound parameters per statement
+_BATCH = 500
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = int(EMBEDDING_CACHE_MAX_MB * 2**20)):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(os.path.join(path, "index.sqlite"), timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key BLOB PRIMARY KEY,
+                dimension INTEGER NOT NULL,
+                slot INTEGER NOT NULL,
+                used INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+            CREATE TABLE IF NOT EXISTS free_slots (
+                dimension INTEGER NOT NULL,
+                slot INTEGER NOT NULL,
+                PRIMARY KEY (dimension, slot)
+            );
+        """)
+        self._clock = self._db.execute("SELECT COALESCE(MAX(used), 0) FROM entries").fetchone()[0]
+        self._maps: dict = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for vectors in self._maps.values():
+            vectors.flush()
+        self._maps.clear()
+        self._db.close()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @property
+    def size_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(dimension), 0) * 4 FROM entries").fetchone()[0]
+
+    def _vectors(self, dimension: int, slots: int = 0) -> np.memmap:
+        """The vector file for *dimension*, grown to hold at least *slots* vectors."""
+        vectors = self._maps.get(dimension)
+        if vectors is not None and len(vectors) >= slots:
+            return vectors
+        file_path = os.path.join(self.path, f"vectors-{dimension}.f32")
+        capacity = os.path.getsize(file_path) // (4 * dimension) if os.path.exists(file_path) else 0
+        if capacity < slots or capacity == 0:
+            if vectors is not None:
+                vectors.flush()
+            capacity = max(slots, min(max(2 * capacity, 1024), self.max_bytes // (4 * dimension)))
+            with open(file_path, "ab") as f:
+                f.truncate(capacity * 4 * dimension)
+        vectors = np.memmap(file_path, dtype="float32", mode="r+", shape=(capacity, dimension))
+        self._maps[dimension] = vectors
+        return vectors
+
+    def get_many(self, model_name: str, texts: list) -> list:
+        """Cached vector for each of *texts*, or None where there is none."""
+        keys = [cache_key(model_name, text) for text in texts]
+        found = {}
+        for start in range(0, len(keys), _BATCH):
+            batch = keys[start:start + _BATCH]
+            rows = self._db.execute(
+                f"SELECT key, dimension, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch,
+            ).fetchall()
+            found.update((key, (dimension, slot)) for key, dimension, slot in rows)
+        if found:
+            self._clock += 1
+            with self._db:
+                self._db.executemany("UPDATE entries SET used = ? WHERE key = ?",
+                                     [(self._clock, key) for key in found])
+        result = []
+        for key in keys:
+            if key in found:
+                dimension, slot = found[key]
+                result.append(np.array(self._vectors(dimension)[slot]))
+            else:
+                result.append(None)
+        return result
+
+    def _evict(self, needed: int):
+        """Drop least recently used entries until *needed* more bytes fit."""
+        excess = self.size_bytes + needed - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        victims = []
+        for key, dimension, slot in self._db.execute("SELECT key, dimension, slot FROM entries ORDER BY used"):
+            victims.append((key, dimension, slot))
+            freed += 4 * dimension
+            if freed >= excess:
+                break
+        with self._db:
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _, _ in victims])
+            self._db.executemany("INSERT OR IGNORE INTO free_slots VALUES (?, ?)",
+                                 [(dimension, slot) for _, dimension, slot in victims])
+
+    def _allocate(self, dimension: int, count: int) -> list:
+        slots = [slot for (slot,) in self._db.execute(
+            "SELECT slot FROM free_slots WHERE dimension = ? ORDER BY slot LIMIT ?", (dimension, count))]
+        if len(slots) < count:
+            end = self._db.execute(
+                "SELECT MAX(COALESCE((SELECT MAX(slot) FROM entries WHERE dimension = ?), -1),"
+                " COALESCE((SELECT MAX(slot) FROM free_slots WHERE dimension = ?), -1)) + 1",
+                (dimension, dimension),
+            ).fetchone()[0]
+            slots.extend(range(end, end + count - len(slots)))
+        return slots
+
+    def put_many(self, model_name: str, texts: list, vectors: list):
+        """Store *vectors* for *texts*, evicting old entries to stay within budget."""
+        pending = {}
+        for text, vector in zip(texts, vectors):
+            pending[cache_key(model_name, text)] = np.asarray(vector, dtype="float32")
+        keys = list(pending)
+        for start in range(0, len(keys), _BATCH):
+            batch = keys[start:start + _BATCH]
+            for (key,) in self._db.execute(
+                f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch,
+            ).fetchall():
+                del pending[key]
+        if not pending:
+            return
+        dimension = len(next(iter(pending.values())))
+        keep = self.max_bytes // (4 * dimension)
+        items = list(pending.items())[:keep]
+        if not items:
+            return
+
+        self._evict(4 * dimension * len(items))
+        slots = self._allocate(dimension, len(items))
+        store = self._vectors(dimension, max(slots) + 1)
+        for slot, (_, vector) in zip(slots, items):
+            store[slot] = vector
+        store.flush()
+        self._clock += 1
+        with self._db:
+            self._db.executemany("DELETE FROM free_slots WHERE dimension = ? AND slot = ?",
+                                 [(dimension, slot) for slot in slots])
+            self._db.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)",
+                                 [(key, dimension, slot, self._clock) for slot, (key, _) in zip(slots, items)])
+
+
+def open_embedding_cache() -> EmbeddingCache | None:
+    """The configured cache, or None when EMBEDDING_CACHE is off."""
+    return EmbeddingCache() if EMBEDDING_CACHE else None
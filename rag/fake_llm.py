@@ -0,0 +1,43 @@
+# rag/fake_llm.py
+"""
+Local stand-in for ``genai.GenerativeModel`` used by the load-test harness.
+
+It never leaves the process: answers are canned Arabic Markdown streamed
+with configurable time-to-first-token and inter-token latency, so the API
+can be load-tested without Gemini quotas or cost.
+"""
+import time
+from rag.settings import FAKE_LLM_TTFT_MS, FAKE_LLM_TOKEN_LATENCY_MS, FAKE_LLM_TOKENS
+
+_WORDS = (
+    "## مقدمة\n وفقاً للنصوص التنظيمية المعمول بها في قطاع التعليم العالي ، "
+    "يحدد القرار الوزاري شروط التسجيل والمنحة والإيواء . "
+    "## خلاصة\n يرجى الرجوع إلى المادة المعنية للاطلاع على التفاصيل ."
+).split(" ")
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name: str = "fake", ttft_ms: float = FAKE_LLM_TTFT_MS,
+                 token_latency_ms: float = FAKE_LLM_TOKEN_LATENCY_MS, tokens: int = FAKE_LLM_TOKENS):
+        self.model_name = model_name
+        self.ttft = ttft_ms / 1000
+        self.token_latency = token_latency_ms / 1000
+        self.tokens = tokens
+
+    def _stream(self, tokens: int):
+        time.sleep(self.ttft)
+        for i in range(tokens):
+            if i:
+                time.sleep(self.token_latency)
+            yield FakeChunk(_WORDS[i % len(_WORDS)] + " ")
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        if stream:
+            return self._stream(self.tokens)
+        # Non-streaming calls are title classifications: a few words at most
+        return FakeChunk("".join(chunk.text for chunk in self._stream(5)).strip())
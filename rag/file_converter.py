@@ -1,15 +1,147 @@
 # rag/file_converter.py
+"""
+Text extraction for ingestion.
+
+DOCX files are read by streaming ``word/document.xml`` straight out of the
+zip archive with lxml ``iterparse``: paragraphs and table rows come out in
+document order and every element is freed as soon as it has been turned into
+text, so memory stays flat however large the document is (python-docx builds
+the whole object tree first, and ``doc.paragraphs`` skips tables entirely).
+
+Headings (the built-in "Heading N" / "Title" styles or an outline level) are
+written as Markdown-style ``#`` lines, which the chunker uses as section
+boundaries. Table rows are written as one line each, cells separated by
+`` | `` and labelled with the header row, so a row retrieved on its own
+still says what its numbers are.
+"""
 import os
-from docx import Document
+import re
+import zipfile
+from typing import Iterator
+
+from lxml import etree
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P, _TBL, _TR, _TC = _W + "p", _W + "tbl", _W + "tr", _W + "tc"
+_T, _TAB, _BR, _CR = _W + "t", _W + "tab", _W + "br", _W + "cr"
+
+_HEADING_RE = re.compile(r"^heading\s*(\d)$")
+_MAX_HEADING_LEVEL = 6
+
+
+def _outline_level(props) -> int:
+    """Heading level from ``w:outlineLvl`` under *props* (0-8; 9 is body text)."""
+    outline = props.find(_W + "outlineLvl") if props is not None else None
+    value = outline.get(_W + "val", "") if outline is not None else ""
+    return int(value) + 1 if value.isdigit() and int(value) < 9 else 0
+
+
+def _style_levels(archive: zipfile.ZipFile) -> dict:
+    """Heading level of every paragraph style id in ``word/styles.xml``.
+
+    Style ids are localized (``Titre1``, ``1``...), so headings are recognised
+    by the style's English name or its outline level.
+    """
+    try:
+        source = archive.open("word/styles.xml")
+    except KeyError:
+        return {}
+    levels = {}
+    with source:
+        for _, style in etree.iterparse(source, tag=_W + "style"):
+            style_id = style.get(_W + "styleId")
+            name = style.find(_W + "name")
+            name = (name.get(_W + "val") if name is not None else "").lower()
+            match = _HEADING_RE.match(name)
+            if name == "title":
+                levels[style_id] = 1
+            elif match:
+                levels[style_id] = int(match.group(1))
+            else:
+                level = _outline_level(style.find(_W + "pPr"))
+                if level:
+                    levels[style_id] = level
+            style.clear()
+    return levels
+
+
+def _paragraph_text(p) -> str:
+    parts = []
+    for node in p.iter(_T, _TAB, _BR, _CR):
+        if node.tag == _T:
+            parts.append(node.text or "")
+        else:
+            parts.append(" ")
+    return " ".join("".join(parts).split())
+
+
+def _heading_level(p, style_levels: dict) -> int:
+    props = p.find(_W + "pPr")
+    if props is None:
+        return 0
+    style = props.find(_W + "pStyle")
+    level = _outline_level(props)
+    if not level and style is not None:
+        level = style_levels.get(style.get(_W + "val"), 0)
+    return level
+
+
+def _row_cells(tr) -> list:
+    return [
+        " ".join(_paragraph_text(p) for p in tc.iter(_P)).strip()
+        for tc in tr.iterchildren(_TC)
+    ]
+
+
+def _free(element):
+    """Drop *element*'s content and the already processed siblings before it."""
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def _in_cell(element) -> bool:
+    return next(element.iterancestors(_TC), None) is not None
+
+
+def iter_docx_lines(docx_path: str) -> Iterator[str]:
+    """Yield the paragraphs and table rows of a DOCX, in document order."""
+    with zipfile.ZipFile(docx_path) as archive:
+        style_levels = _style_levels(archive)
+        header = None  # first non-empty row of the current top-level table
+        with archive.open("word/document.xml") as source:
+            # Nested tables and the paragraphs of a cell are read with their row
+            for _, element in etree.iterparse(source, tag=(_P, _TR, _TBL)):
+                if _in_cell(element):
+                    continue
+                if element.tag == _P:
+                    text = _paragraph_text(element)
+                    if text:
+                        level = min(_heading_level(element, style_levels), _MAX_HEADING_LEVEL)
+                        yield f"{'#' * level} {text}" if level else text
+                elif element.tag == _TR:
+                    cells = _row_cells(element)
+                    if header is None and any(cells):
+                        header = cells
+                        yield " | ".join(cell for cell in cells if cell)
+                    elif any(cells):
+                        yield " | ".join(
+                            f"{header[i]}: {cell}" if i < len(header) and header[i] and header[i] != cell else cell
+                            for i, cell in enumerate(cells) if cell
+                        )
+                else:
+                    header = None
+                _free(element)
+
 
 def extract_text_from_docx(docx_path: str) -> str:
     """
-    Read paragraphs from a DOCX and return a single cleaned string.
+    Read paragraphs and table rows from a DOCX and return a single cleaned string.
     """
     try:
-        doc = Document(docx_path)
-        paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-        return "\n".join(paragraphs)
+        return "\n".join(iter_docx_lines(docx_path))
     except Exception as e:
         print(f"[DOCX ERROR] {e}")
         return ""
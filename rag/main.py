@@ -1,13 +1,19 @@
 # rag/main.py
 import os
 import json
-from rag.settings import VECTOR_STORE_PATH, CHUNK_SIZE, MEMORY_SIZE
+import argparse
+from rag.settings import VECTOR_STORE_PATH, CHUNK_SIZE, MEMORY_SIZE, VECTOR_METRIC, SHARD_BY, SHARD_MAX_VECTORS
 from rag.ingestion import ingest_documents
-from rag.chunking import chunk_text
+from rag.chunking import chunk_document
 from rag.embedder import embed_chunks
+from rag.embedding_cache import open_embedding_cache
 from rag.vector_store import VectorStore
+from rag.sharded_store import ShardedVectorStore, load_store, store_exists
 from rag.retriever import retrieve_relevant_chunks
-from rag.agent import generate_answer
+from rag.agent import generate_answer, model
+from rag.memory import summarize
+from rag.profiling import profiled
+from rag.settings import PROFILE_INGEST, MEMORY_MODE, MEMORY_RECENT_TURNS, VECTOR_REDUCTION, VECTOR_REDUCED_DIM
 
 
 def load_processed_files(path: str) -> set:
@@ -25,12 +31,15 @@ def save_processed_files(path: str, filenames: set):
         json.dump(list(filenames), f)
 
 
-def build_or_update_store(files_to_process: set, index_path: str) -> VectorStore:
+def build_or_update_store(files_to_process: set, store_path: str = VECTOR_STORE_PATH) -> VectorStore:
     """Read DOCX/TXT files, chunk, embed and append to FAISS index."""
+    if os.path.isfile(store_path):
+        raise ValueError(f"{store_path} is a snapshot, which is read-only; import it into a directory first")
     texts = ingest_documents("data", list(files_to_process))
-    chunks: list[str] = []
-    for _, txt in texts:
-        chunks.extend(chunk_text(txt, CHUNK_SIZE))
+    documents: list[dict] = []
+    for filename, txt in texts:
+        documents.extend(chunk_document(filename, txt, CHUNK_SIZE))
+    chunks = [doc["content"] for doc in documents]
 
     # Debug ‑ ensure we have useful chunks
     print(f"[DEBUG] Chunks kept after cleaning: {len(chunks)}")
@@ -41,28 +50,40 @@ def build_or_update_store(files_to_process: set, index_path: str) -> VectorStore
         raise RuntimeError("No chunks to embed – check cleaning thresholds or data directory.")
 
     print("\nGenerating embeddings…")
-    vectors = embed_chunks(chunks)
+    cache = open_embedding_cache()
+    try:
+        vectors = embed_chunks(chunks, cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
     if not vectors:
         raise RuntimeError("Embedding returned empty list.")
     if isinstance(vectors[0], float):
         vectors = [vectors]
 
-    metadata = [{"content": ch} for ch in chunks]
+    metadata = documents
     embedding_dim = len(vectors[0])
 
     # create or load store
-    if os.path.exists(index_path):
-        store = VectorStore.load(VECTOR_STORE_PATH)
+    if store_exists(store_path):
+        store = load_store(store_path)
+    elif SHARD_BY != "none":
+        store = ShardedVectorStore(embedding_dim, shard_by=SHARD_BY,
+                                   max_shard_size=SHARD_MAX_VECTORS, metric=VECTOR_METRIC)
     else:
-        store = VectorStore(dimension=embedding_dim)
+        store = VectorStore(dimension=embedding_dim, metric=VECTOR_METRIC)
 
     store.add(vectors, metadata)
-    store.save(VECTOR_STORE_PATH)
+    if VECTOR_REDUCTION != "none" and not store.reduced:
+        print(f"📉 Reducing vectors to {VECTOR_REDUCED_DIM} dimensions ({VECTOR_REDUCTION})")
+        store.reduce(VECTOR_REDUCED_DIM, VECTOR_REDUCTION)
+    store.save(store_path)
     return store
 
 
 def chat_loop(store: VectorStore):
     conversation_history: list[tuple[str, str]] = []
+    summary = ""
     print("\n📝 Enter your question in Arabic (or type 'exit'):")
     while True:
         query = input("\n📝 ")
@@ -79,37 +100,61 @@ def chat_loop(store: VectorStore):
             print(f"{i}.", ch[:150], "…\n")
 
         # Generate answer
-        answer = generate_answer(top_chunks, query, conversation_history)
+        answer = generate_answer(top_chunks, query, conversation_history, summary)
         print(f"\n🗣️ {answer}\n")
 
         # Update conversation memory
         conversation_history.append((query, answer))
-        if len(conversation_history) > MEMORY_SIZE:
+        if MEMORY_MODE == "summary" and len(conversation_history) > MEMORY_RECENT_TURNS:
+            folded = conversation_history[:-MEMORY_RECENT_TURNS]
+            summary = summarize(model, summary, folded)
+            conversation_history = conversation_history[-MEMORY_RECENT_TURNS:]
+        elif len(conversation_history) > MEMORY_SIZE:
             conversation_history = conversation_history[-MEMORY_SIZE:]
 
 
 def main():
-    index_path = os.path.join(VECTOR_STORE_PATH, "index.faiss")
+    parser = argparse.ArgumentParser(description="Build or update the vector store, then answer questions")
+    parser.add_argument("--batch", metavar="QUESTIONS_JSONL",
+                        help="answer the questions in this JSONL file instead of chatting (see rag.batch)")
+    parser.add_argument("--out", default="answers.jsonl", help="batch output file; rerun with it to resume")
+    parser.add_argument("--concurrency", type=int, default=4, help="answers generated at once in batch mode")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if os.path.isfile(VECTOR_STORE_PATH):
+        raise SystemExit(
+            f"❌ VECTOR_STORE_PATH={VECTOR_STORE_PATH} is a snapshot, which can only be served.\n"
+            f"   Import it into a directory first: python -m rag.snapshot import {VECTOR_STORE_PATH} vector_store\n"
+            f"   then point VECTOR_STORE_PATH at that directory."
+        )
 
     processed = load_processed_files(VECTOR_STORE_PATH)
     current_files = set(os.listdir("data"))
     new_files = current_files - processed
 
-    if not os.path.exists(index_path):
+    if not store_exists(VECTOR_STORE_PATH):
         print("\n🆕 Building new vector store from all files…")
         files_to_process = current_files
         processed.clear()
-        store = build_or_update_store(files_to_process, index_path)
+        with profiled("ingest", PROFILE_INGEST):
+            store = build_or_update_store(files_to_process, VECTOR_STORE_PATH)
         processed.update(files_to_process)
         save_processed_files(VECTOR_STORE_PATH, processed)
     elif new_files:
         print("\n📥 New files detected – updating store…")
-        store = build_or_update_store(new_files, index_path)
+        with profiled("ingest", PROFILE_INGEST):
+            store = build_or_update_store(new_files, VECTOR_STORE_PATH)
         processed.update(new_files)
         save_processed_files(VECTOR_STORE_PATH, processed)
     else:
         print("\n✅ No new files – loading existing vector store…")
-        store = VectorStore.load(VECTOR_STORE_PATH)
+        store = load_store(VECTOR_STORE_PATH)
+
+    if args.batch:
+        from rag.batch import run_batch
+        run_batch(store, args.batch, args.out, args.concurrency, args.top_k)
+        return
 
     # Start interaction loop
     chat_loop(store)
@@ -0,0 +1,57 @@
+# rag/memory.py
+"""
+Rolling conversation memory.
+
+Only the last MEMORY_RECENT_TURNS question/answer pairs go into the prompt
+verbatim. Older turns are folded into a short summary, one step at a time:
+each update gives the model the previous summary plus the turns that just
+left the verbatim window, so past turns are never summarized twice.
+"""
+from rag.settings import SUMMARY_MAX_WORDS
+
+# Answers are long Markdown documents; only their beginning is summarized
+_ANSWER_CHARS = 2000
+
+
+def pair_turns(messages: list) -> list:
+    """(question, answer) pairs from rows with ``is_user`` and ``content``,
+    skipping questions that never got an answer."""
+    turns = []
+    i = 0
+    while i < len(messages) - 1:
+        if messages[i]['is_user'] and not messages[i + 1]['is_user']:
+            turns.append((messages[i]['content'], messages[i + 1]['content']))
+            i += 2
+        else:
+            i += 1
+    return turns
+
+
+def fold_count(messages: list, recent_turns: int) -> int:
+    """How many of the oldest *messages* fall outside the verbatim window,
+    without separating a question from its answer."""
+    count = len(messages) - recent_turns * 2
+    if count <= 0:
+        return 0
+    if messages[count - 1]['is_user']:
+        count -= 1
+    return count
+
+
+def summarize(model, summary: str, turns: list, max_words: int = SUMMARY_MAX_WORDS) -> str:
+    """Return *summary* updated with *turns* in a single LLM call."""
+    new_turns = "\n\n".join(
+        f"المستخدم: {question}\nالمساعد: {answer[:_ANSWER_CHARS]}" for question, answer in turns
+    )
+    prompt = (
+        "أنت تلخص محادثة بين مستخدم ومساعد حول لوائح وزارة التعليم العالي في الجزائر.\n"
+        f"ادمج الملخص السابق مع الأدوار الجديدة في ملخص واحد موجز لا يتجاوز {max_words} كلمة.\n"
+        "احتفظ بما قد يُحتاج إليه لاحقاً: مواضيع أسئلة المستخدم، والمعطيات التي ذكرها عن نفسه، "
+        "والأرقام والآجال، والمواد والمصادر التي استُشهد بها.\n"
+        "اكتب الملخص بالعربية فقط، دون مقدمة أو عناوين.\n\n"
+        f"الملخص السابق:\n{summary or 'لا يوجد'}\n\n"
+        f"الأدوار الجديدة:\n{new_turns}\n\n"
+        "الملخص المحدث:"
+    )
+    response = model.generate_content(prompt)
+    return response.text.strip()
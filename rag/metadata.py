@@ -0,0 +1,79 @@
+# rag/metadata.py
+"""
+Document-level metadata (source, type, date) and per-chunk article numbers,
+so retrieved chunks can be cited and retrieval can be scoped by source.
+"""
+import os
+import re
+
+# "المادة 12" at a word boundary, not references such as "بالمادة 12"
+_ARTICLE_RE = re.compile(r"(?<!\S)المادة\s+(\d+|الأولى)")
+
+# Checked in order: the first keyword found in the filename, then in the
+# opening lines of the text, decides the document type.
+DOC_TYPES = [
+    ("مرسوم", "decree"),
+    ("قرار", "decision"),
+    ("تعليمة", "instruction"),
+    ("منشور", "circular"),
+    ("مذكرة", "memo"),
+    ("قانون", "law"),
+    ("النشرة الرسمية", "bulletin"),
+]
+
+_MONTHS = {
+    "جانفي": 1, "يناير": 1, "فيفري": 2, "فبراير": 2, "مارس": 3, "أفريل": 4, "أبريل": 4,
+    "ماي": 5, "مايو": 5, "جوان": 6, "يونيو": 6, "جويلية": 7, "يوليو": 7, "أوت": 8,
+    "أغسطس": 8, "سبتمبر": 9, "أكتوبر": 10, "نوفمبر": 11, "ديسمبر": 12,
+}
+_FULL_DATE_RE = re.compile(r"(\d{1,2})\s+(" + "|".join(_MONTHS) + r")\s+(\d{4})")
+_YEAR_RE = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+
+# How much of the document header is searched for its type and date
+_HEADER_CHARS = 400
+
+
+def detect_doc_type(filename: str, text: str) -> str | None:
+    for haystack in (filename, text[:_HEADER_CHARS]):
+        for keyword, doc_type in DOC_TYPES:
+            if keyword in haystack:
+                return doc_type
+    return None
+
+
+def detect_date(filename: str, text: str) -> str | None:
+    """
+    ISO date of the document: the first full Arabic date in its header,
+    otherwise January 1st of a year found in the filename or header.
+    """
+    match = _FULL_DATE_RE.search(text[:_HEADER_CHARS])
+    if match:
+        day, month, year = match.groups()
+        return f"{int(year):04d}-{_MONTHS[month]:02d}-{int(day):02d}"
+    for haystack in (filename, text[:_HEADER_CHARS]):
+        match = _YEAR_RE.search(haystack)
+        if match:
+            return f"{match.group(1)}-01-01"
+    return None
+
+
+def document_metadata(filename: str, text: str) -> dict:
+    return {
+        "source": os.path.splitext(filename)[0],
+        "doc_type": detect_doc_type(filename, text),
+        "date": detect_date(filename, text),
+    }
+
+
+def find_articles(text: str) -> list:
+    return [1 if n == "الأولى" else int(n) for n in _ARTICLE_RE.findall(text)]
+
+
+def format_chunk(meta: dict) -> str:
+    """Chunk content prefixed with its source so the model can cite it."""
+    if not meta.get("source"):
+        return meta["content"]
+    label = meta["source"]
+    if meta.get("article") is not None:
+        label += f"، المادة {meta['article']}"
+    return f"[المصدر: {label}]\n{meta['content']}"
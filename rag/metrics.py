@@ -0,0 +1,122 @@
+# rag/metrics.py
+"""
+Prometheus metrics for the chat pipeline.
+
+Stages are timed with ``timed("embed")`` (or ``observe_stage``); each
+observation lands in the ``rag_stage_seconds`` histogram and, while a
+request is being handled with Server-Timing enabled, in that request's
+timing list so the API can report it back in a ``Server-Timing`` header.
+"""
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST,
+)
+
+_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Time spent in each stage of a chat turn", ["stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "rag_db_query_seconds", "Postgres statement time by operation", ["operation"],
+    buckets=_LATENCY_BUCKETS,
+)
+DB_CONNECTIONS_OPEN = Gauge(
+    "rag_db_connections_open", "Postgres connections currently open",
+    multiprocess_mode="livesum",
+)
+CACHE_REQUESTS = Counter(
+    "rag_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"],
+)
+PROMPT_TOKENS = Histogram(
+    "rag_prompt_tokens", "Prompt tokens reported by the LLM",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000),
+)
+PROMPT_CHARS = Histogram(
+    "rag_prompt_chars", "Characters in the built prompt",
+    buckets=(1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000),
+)
+LLM_STREAMS = Counter(
+    "rag_llm_streams_total", "Streamed LLM answers by outcome (completed, cancelled, error)", ["outcome"],
+)
+ADMISSION_ACTIVE = Gauge(
+    "rag_admission_active", "LLM calls currently admitted", multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "rag_admission_queue_depth", "Requests waiting for an LLM slot", ["kind"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "rag_admission_wait_seconds", "Time spent waiting for an LLM slot", ["kind"],
+    buckets=_LATENCY_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "rag_admission_rejected_total", "Requests turned away by admission control", ["kind", "reason"],
+)
+EXECUTOR_PENDING = Gauge(
+    "rag_executor_pending", "Calls queued or running in each worker pool", ["pool"],
+    multiprocess_mode="livesum",
+)
+EXECUTOR_WAIT_SECONDS = Histogram(
+    "rag_executor_wait_seconds", "Time a call waited for a worker thread", ["pool"],
+    buckets=_LATENCY_BUCKETS,
+)
+PROFILES_SKIPPED = Counter(
+    "rag_profiles_skipped_total", "Profiles not taken because another session was running", ["label"],
+)
+
+_request_timings: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+
+# ------------------------------------------------------------
+# Server-Timing support
+# ------------------------------------------------------------
+def start_request_timings() -> contextvars.Token:
+    return _request_timings.set([])
+
+
+def finish_request_timings(token: contextvars.Token) -> str:
+    """Reset the request's timing list and return it as a Server-Timing value."""
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    totals: dict = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+def render_latest() -> tuple:
+    """Exposition body and content type, aggregating worker processes when
+    PROMETHEUS_MULTIPROC_DIR is set (gunicorn with several workers)."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,219 @@
+# rag/profiling.py
+"""
+Opt-in profiling of hot paths.
+
+Two modes:
+  - "cpu":  cProfile of the calling thread, plus the worker-pool calls made
+            on the session's behalf (see ``worker_profile``), saved as a
+            pstats ``.prof`` file (open with ``python -m pstats`` or
+            snakeviz). On the event loop thread this also records the
+            coroutines of other requests that ran in the meantime.
+  - "wall": wall-clock stack sampling of every thread, saved as folded
+            stacks (``.folded``, feed to flamegraph.pl or speedscope). This is
+            the useful mode for async handlers, where time is spent waiting
+            or on worker threads rather than on the calling thread.
+
+Only one session runs at a time; requests that would start a second one are
+not profiled and counted in ``rag_profiles_skipped_total``.
+"""
+import os
+import re
+import sys
+import time
+import uuid
+import random
+import pstats
+import cProfile
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from rag.settings import PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_INTERVAL_MS
+from rag.metrics import PROFILES_SKIPPED
+
+MODES = {"cpu", "wall"}
+_ARTIFACT_RE = re.compile(r"^[\w.-]+\.(prof|folded)$")
+_active = threading.Lock()
+_current: contextvars.ContextVar = contextvars.ContextVar("profile_session", default=None)
+
+
+class WallClockSampler:
+    """Sample the Python stacks of all threads every *interval* seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="wall-sampler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while True:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    def __init__(self, label: str, mode: str):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode: {mode!r}")
+        self.label = label
+        self.mode = mode
+        self.path = None
+        self.stopped = False
+        self._profiler = None
+        self._workers: list = []  # cProfile.Profile of each finished worker call
+        self._workers_lock = threading.Lock()
+        self._started = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.mode == "cpu":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = WallClockSampler(PROFILE_INTERVAL_MS / 1000)
+            self._profiler.start()
+        return self
+
+    @contextmanager
+    def in_worker(self):
+        """Profile the calling worker thread into this session ("cpu" mode only)."""
+        if self.mode != "cpu" or self.stopped:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+: one profiler per process, and the session's already sees this thread
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._workers_lock:
+                if not self.stopped:
+                    self._workers.append(profiler)
+
+    def stop(self) -> str:
+        """Stop profiling and write the artifact; returns its path."""
+        with self._workers_lock:
+            self.stopped = True
+        if self.mode == "cpu":
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        elapsed_ms = (time.perf_counter() - self._started) * 1000
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = (f"{time.strftime('%Y%m%d-%H%M%S')}-{self.label}-{elapsed_ms:.0f}ms-"
+                f"{uuid.uuid4().hex[:6]}.{'prof' if self.mode == 'cpu' else 'folded'}")
+        self.path = os.path.join(PROFILE_DIR, name)
+        if self.mode == "cpu":
+            with self._workers_lock:
+                stats = pstats.Stats(self._profiler)
+                if self._workers:
+                    stats.add(*self._workers)
+            stats.dump_stats(self.path)
+        else:
+            self._profiler.dump(self.path)
+        print(f"[PROFILE] {self.label} ({self.mode}) → {self.path}")
+        return self.path
+
+
+def start_profile(label: str, mode: str | None = None) -> ProfileSession | None:
+    """
+    Start a session when *mode* is given (an explicit request) or when this
+    call is picked by PROFILE_SAMPLE_RATE. Returns None when not profiling.
+    """
+    if mode is None:
+        if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+            return None
+        mode = PROFILE_MODE
+    if not _active.acquire(blocking=False):
+        PROFILES_SKIPPED.labels(label).inc()
+        print(f"[PROFILE] {label} ({mode}) skipped: another profile is running")
+        return None
+    try:
+        session = ProfileSession(label, mode).start()
+    except Exception:
+        _active.release()
+        raise
+    _current.set(session)
+    return session
+
+
+def stop_profile(session: ProfileSession | None) -> str | None:
+    """Stop *session* and write its artifact; further calls return the same path."""
+    if session is None or session.stopped:
+        return session.path if session else None
+    try:
+        return session.stop()
+    finally:
+        _active.release()
+
+
+@contextmanager
+def worker_profile():
+    """Around a worker-pool call: record it in the caller's "cpu" session, if any."""
+    session = _current.get()
+    if session is None:
+        yield
+        return
+    with session.in_worker():
+        yield
+
+
+@contextmanager
+def profiled(label: str, mode: str | None = None):
+    session = start_profile(label, mode)
+    try:
+        yield session
+    finally:
+        stop_profile(session)
+
+
+def list_profiles() -> list:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if _ARTIFACT_RE.match(name):
+            stat = os.stat(os.path.join(PROFILE_DIR, name))
+            profiles.append({"name": name, "size": stat.st_size, "created": stat.st_mtime})
+    return profiles
+
+
+def profile_path(name: str) -> str | None:
+    """Path of a stored artifact, or None for unknown or unsafe names."""
+    if not _ARTIFACT_RE.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
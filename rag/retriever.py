@@ -1,14 +1,71 @@
+import json
+import socket
 import numpy as np
 from rag.vector_store import VectorStore
 from rag.embedder import embed_chunks
+from rag.settings import SIDECAR_TIMEOUT, SCORE_THRESHOLD, RETRIEVAL_MODE, HIER_TOP_DOCS
+from rag.metrics import timed
+from rag.metadata import format_chunk
 
-def retrieve_relevant_chunks(store: VectorStore, query: str, top_k: int = 5) -> list:
-    query_embedding = embed_chunks([query])
+
+class SidecarClient:
+    """
+    Stand-in for a VectorStore that forwards embedding and search to the
+    shared sidecar process (rag.sidecar) over its Unix socket.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = SIDECAR_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _call(self, payload: dict) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        if not line:
+            raise RuntimeError("Sidecar closed the connection without a response")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RuntimeError(f"Sidecar error: {response.get('error')}")
+        return response
+
+    def retrieve(self, query: str, top_k: int = 5, score_threshold=None, filters=None, top_docs=None) -> list:
+        return self._call({
+            "op": "retrieve", "query": query, "top_k": top_k,
+            "score_threshold": score_threshold, "filters": filters, "top_docs": top_docs,
+        })["chunks"]
+
+    def embed(self, texts: list) -> list:
+        return self._call({"op": "embed", "texts": texts})["embeddings"]
+
+
+_DEFAULT_TOP_DOCS = HIER_TOP_DOCS if RETRIEVAL_MODE == "hierarchical" else None
+
+
+def retrieve_relevant_chunks(store: VectorStore, query: str, top_k: int = 5,
+                             score_threshold=SCORE_THRESHOLD, filters: dict | None = None,
+                             top_docs: int | None = _DEFAULT_TOP_DOCS) -> list:
+    """
+    Return the *top_k* chunks closest to *query*, each prefixed with its
+    source for citation. *filters* restricts the search by source, type,
+    article or date, and *top_docs* to the chunks of that many closest
+    documents (see VectorStore); it defaults to RETRIEVAL_MODE.
+    """
+    if isinstance(store, SidecarClient):
+        with timed("sidecar_retrieve"):
+            return store.retrieve(query, top_k, score_threshold, filters, top_docs)
+
+    with timed("embed"):
+        query_embedding = embed_chunks([query], model_name=store.model_name)
 
     if isinstance(query_embedding[0], float):
         query_embedding = [query_embedding]
 
     query_vector = np.array(query_embedding, dtype='float32')
 
-    results = store.search(query_vector[0], top_k)
-    return [meta["content"] for meta in results]
+    with timed("search"):
+        results = store.search(query_vector[0], top_k, score_threshold, filters, top_docs)
+    return [format_chunk(meta) for meta in results]
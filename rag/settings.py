@@ -13,3 +13,120 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # New memory size setting
 MEMORY_SIZE = int(os.getenv("MEMORY_SIZE", 10))
+
+# Embedding/search sidecar (rag.sidecar). When SIDECAR_SOCKET is set the API
+# talks to the sidecar instead of loading the model and index itself.
+SIDECAR_SOCKET = os.getenv("SIDECAR_SOCKET")
+SIDECAR_MAX_BATCH = int(os.getenv("SIDECAR_MAX_BATCH", 32))
+SIDECAR_MAX_WAIT_MS = float(os.getenv("SIDECAR_MAX_WAIT_MS", 5))
+SIDECAR_TIMEOUT = float(os.getenv("SIDECAR_TIMEOUT", 30))
+
+# Vector search. VECTOR_METRIC applies to newly built stores ("l2" or "cosine");
+# SCORE_THRESHOLD, when set, drops retrieved chunks weaker than it (a maximum
+# distance for l2 stores, a minimum cosine similarity for cosine stores).
+VECTOR_METRIC = os.getenv("VECTOR_METRIC", "l2")
+SCORE_THRESHOLD = float(os.getenv("SCORE_THRESHOLD")) if os.getenv("SCORE_THRESHOLD") else None
+
+# LLM backend: "gemini" (default) or "fake" for load tests without upstream
+# calls. The fake model streams FAKE_LLM_TOKENS tokens, the first after
+# FAKE_LLM_TTFT_MS and the rest FAKE_LLM_TOKEN_LATENCY_MS apart.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+FAKE_LLM_TTFT_MS = float(os.getenv("FAKE_LLM_TTFT_MS", 300))
+FAKE_LLM_TOKEN_LATENCY_MS = float(os.getenv("FAKE_LLM_TOKEN_LATENCY_MS", 20))
+FAKE_LLM_TOKENS = int(os.getenv("FAKE_LLM_TOKENS", 200))
+
+# Add a Server-Timing header with per-stage durations to API responses
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() in {"1", "true", "yes"}
+
+# On-demand profiling (rag.profiling). A fraction PROFILE_SAMPLE_RATE of chat
+# requests and ingestion runs is profiled in PROFILE_MODE ("wall" stack
+# sampling or "cpu" cProfile); admins can force a profile with the X-Profile
+# header and ADMIN_TOKEN. PROFILE_INGEST=cpu|wall always profiles ingestion
+# runs of rag.main.
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "wall")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_INGEST = os.getenv("PROFILE_INGEST")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Sharding for newly built stores: "none", "source" or "doc_type" (one shard
+# per document collection) or "size" (new shard every SHARD_MAX_VECTORS).
+SHARD_BY = os.getenv("SHARD_BY", "none")
+SHARD_MAX_VECTORS = int(os.getenv("SHARD_MAX_VECTORS", 50000))
+SHARD_SEARCH_THREADS = int(os.getenv("SHARD_SEARCH_THREADS", 4))
+
+# Retrieval mode: "flat" scores every chunk; "hierarchical" first picks the
+# HIER_TOP_DOCS documents whose centroid is closest to the query and then
+# searches only their chunks.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "flat")
+HIER_TOP_DOCS = int(os.getenv("HIER_TOP_DOCS", 3))
+
+# Answer streaming: at most STREAM_BUFFER_CHUNKS model chunks are buffered for
+# a slow client before generation pauses; SSE streams send a heartbeat
+# comment after SSE_HEARTBEAT_SECONDS without output.
+STREAM_BUFFER_CHUNKS = int(os.getenv("STREAM_BUFFER_CHUNKS", 32))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+
+# Share one LLM generation between concurrent identical first questions
+# (same normalized question and retrieved context, no history)
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() in {"1", "true", "yes"}
+
+# Admission control for LLM calls: at most ADMISSION_LIMIT run at once, up to
+# ADMISSION_QUEUE requests (ADMISSION_PER_USER_QUEUE per user) wait for a slot
+# for at most ADMISSION_MAX_WAIT seconds, and a slot not released after
+# ADMISSION_MAX_HOLD seconds is reclaimed.
+ADMISSION_LIMIT = int(os.getenv("ADMISSION_LIMIT", 16))
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", 64))
+ADMISSION_PER_USER_QUEUE = int(os.getenv("ADMISSION_PER_USER_QUEUE", 2))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", 30))
+ADMISSION_MAX_HOLD = float(os.getenv("ADMISSION_MAX_HOLD", 600))
+
+# Worker pools that keep CPU-heavy work off the API event loop: password
+# hashing, and retrieval (embedding + search). At most *_MAX_PENDING calls
+# per pool are queued or running; further callers wait their turn.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 2))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", 64))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", 64))
+
+# Conversation memory: "full" puts up to MEMORY_SIZE past turns in the prompt;
+# "summary" keeps the last MEMORY_RECENT_TURNS verbatim and folds older turns
+# into a rolling summary (at most SUMMARY_MAX_WORDS words) stored with the
+# conversation and updated after each turn.
+MEMORY_MODE = os.getenv("MEMORY_MODE", "full")
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", 3))
+SUMMARY_MAX_WORDS = int(os.getenv("SUMMARY_MAX_WORDS", 150))
+
+# Persistent embedding cache used when building or updating the store: chunk
+# vectors are reused across rebuilds and only new chunk texts are embedded.
+# The least recently used vectors are evicted beyond EMBEDDING_CACHE_MAX_MB.
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "true").lower() in {"1", "true", "yes"}
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", 1024))
+
+# Optional dimensionality reduction of stored embeddings: "pca" or "opq"
+# projects stored and query vectors to VECTOR_REDUCED_DIM dimensions with a
+# transform fitted on the corpus when the store is built ("none" keeps the
+# full width).
+VECTOR_REDUCTION = os.getenv("VECTOR_REDUCTION", "none")
+VECTOR_REDUCED_DIM = int(os.getenv("VECTOR_REDUCED_DIM", 128))
+
+# Compression of complete API responses of at least COMPRESSION_MIN_BYTES:
+# brotli (quality BROTLI_QUALITY, if the brotli package is installed) or gzip
+# (level GZIP_LEVEL), as the client accepts. Streams are never compressed.
+COMPRESSION = os.getenv("COMPRESSION", "true").lower() in {"1", "true", "yes"}
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+# Session and user lookups: user records are cached per process for
+# USER_CACHE_TTL seconds (0 disables the cache). With SESSION_USER_CLAIMS the
+# verified id, name and email are also kept in the session cookie and trusted
+# for SESSION_CLAIMS_MAX_AGE seconds before they are checked again; this needs
+# SESSION_SECRET, the key the cookie is signed with.
+SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+SESSION_USER_CLAIMS = os.getenv("SESSION_USER_CLAIMS", "false").lower() in {"1", "true", "yes"} and bool(SESSION_SECRET)
+SESSION_CLAIMS_MAX_AGE = float(os.getenv("SESSION_CLAIMS_MAX_AGE", 300))
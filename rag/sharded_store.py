@@ -0,0 +1,285 @@
+# rag/sharded_store.py
+"""
+Sharded vector store.
+
+Vectors are split into independent VectorStore shards, either one per
+document collection (``shard_by="source"`` or ``"doc_type"``) or in fixed-size
+slices (``shard_by="size"``). Searches fan out to the shards on a thread pool
+(FAISS releases the GIL) and the per-shard top-k lists are merged. Each shard
+lives in its own directory, and ``save`` rewrites only the shards that
+changed, so adding a document no longer rewrites the whole index.
+
+Layout::
+
+    vector_store/
+        shards.json            manifest: settings + shard directory per key
+        shards/shard-0000/     a regular VectorStore (index.faiss, metadata.pkl)
+        shards/shard-0001/
+"""
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from rag.vector_store import VectorStore, fit_reduction
+from rag.settings import SHARD_SEARCH_THREADS
+
+MANIFEST = "shards.json"
+SHARD_MODES = {"source", "doc_type", "size"}
+_DEFAULT_KEY = "_default"
+
+_search_pool: ThreadPoolExecutor | None = None
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _search_pool
+    if _search_pool is None:
+        _search_pool = ThreadPoolExecutor(max_workers=SHARD_SEARCH_THREADS, thread_name_prefix="shard-search")
+    return _search_pool
+
+
+class ShardedVectorStore:
+    def __init__(self, dimension: int, shard_by: str = "size", max_shard_size: int = 50000,
+                 metric: str = "l2", model_name: str | None = None):
+        if shard_by not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode: {shard_by!r}")
+        self._dimension = dimension
+        self.shard_by = shard_by
+        self.max_shard_size = max_shard_size
+        self.metric = metric
+        self.model_name = model_name
+        self.shards: dict = {}   # shard key -> VectorStore
+        self.dirs: dict = {}     # shard key -> directory name under shards/
+        self._dirty: set = set()
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards.values())
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def meets_threshold(self, score: float, score_threshold=None) -> bool:
+        return VectorStore.meets_threshold(self, score, score_threshold)
+
+    # ------------------------------------------------------------
+    # Adding
+    # ------------------------------------------------------------
+    def _shard(self, key: str) -> VectorStore:
+        if key not in self.shards:
+            shard = VectorStore(self._dimension, metric=self.metric, model_name=self.model_name)
+            template = self._reduction()
+            if template is not None:
+                shard.apply_reduction(template)  # new shards follow the store's reduction
+            self.shards[key] = shard
+            self.dirs[key] = f"shard-{len(self.dirs):04d}"
+        return self.shards[key]
+
+    def _size_key(self) -> str:
+        if self.shards:
+            key = list(self.shards)[-1]
+            if self.shards[key].ntotal < self.max_shard_size:
+                return key
+        return str(len(self.shards))
+
+    def add(self, vectors, metadata):
+        vectors = np.asarray(vectors, dtype="float32")
+        if self.shard_by == "size":
+            start = 0
+            while start < len(metadata):
+                key = self._size_key()
+                shard = self._shard(key)
+                end = start + min(self.max_shard_size - shard.ntotal, len(metadata) - start)
+                shard.add(vectors[start:end], metadata[start:end])
+                self._dirty.add(key)
+                start = end
+            return
+
+        rows_by_key: dict = {}
+        for i, meta in enumerate(metadata):
+            rows_by_key.setdefault(meta.get(self.shard_by) or _DEFAULT_KEY, []).append(i)
+        for key, rows in rows_by_key.items():
+            self._shard(key).add(vectors[rows], [metadata[i] for i in rows])
+            self._dirty.add(key)
+
+    # ------------------------------------------------------------
+    # Dimensionality reduction
+    # ------------------------------------------------------------
+    @property
+    def reduced(self) -> bool:
+        return bool(self.shards) and all(shard.reduced for shard in self.shards.values())
+
+    def _reduction(self):
+        return next((shard.index for shard in self.shards.values() if shard.reduced), None)
+
+    def reduce(self, dimension: int, method: str = "pca"):
+        """Fit one reduction on the vectors of all shards and apply it to each (see VectorStore.reduce)."""
+        template = self._reduction()
+        if template is None:
+            vectors = np.vstack([shard.index.reconstruct_n(0, shard.ntotal) for shard in self.shards.values()])
+            template = fit_reduction(vectors, dimension, method, self.metric)
+        for key, shard in self.shards.items():
+            if not shard.reduced:
+                shard.apply_reduction(template)
+                self._dirty.add(key)
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for key in sorted(self._dirty):
+            self.shards[key].save(os.path.join(path, "shards", self.dirs[key]))
+        manifest = {
+            "version": 1,
+            "dimension": self._dimension,
+            "shard_by": self.shard_by,
+            "max_shard_size": self.max_shard_size,
+            "metric": self.metric,
+            "model_name": self.model_name,
+            "shards": [
+                {"key": key, "dir": self.dirs[key], "count": shard.ntotal}
+                for key, shard in self.shards.items()
+            ],
+        }
+        tmp_path = os.path.join(path, MANIFEST + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(path, MANIFEST))
+        print(f"💾 Saved {len(self._dirty)} of {len(self.shards)} shards")
+        self._dirty.clear()
+
+    @staticmethod
+    def load(path):
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        store = ShardedVectorStore(
+            manifest["dimension"], manifest["shard_by"], manifest["max_shard_size"],
+            manifest["metric"], manifest.get("model_name"),
+        )
+        entries = manifest["shards"]
+        shards = _pool().map(lambda e: VectorStore.load(os.path.join(path, "shards", e["dir"])), entries)
+        for entry, shard in zip(entries, shards):
+            shard.model_name = store.model_name
+            store.shards[entry["key"]] = shard
+            store.dirs[entry["key"]] = entry["dir"]
+        return store
+
+    # ------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------
+    def _candidate_shards(self, filters: dict | None) -> list:
+        """Shards that can hold matches: a filter on the shard field skips the others."""
+        wanted = (filters or {}).get(self.shard_by) if self.shard_by != "size" else None
+        if wanted is None:
+            return list(self.shards.values())
+        wanted = set(wanted if isinstance(wanted, (list, tuple, set)) else [wanted])
+        return [shard for key, shard in self.shards.items() if key in wanted]
+
+    def _offsets(self) -> dict:
+        """Global id of each shard's first vector, in manifest order."""
+        offsets, total = {}, 0
+        for shard in self.shards.values():
+            offsets[id(shard)] = total
+            total += shard.ntotal
+        return offsets
+
+    def _pick_documents(self, queries: np.ndarray, shards: list, top_docs: int, masks: dict) -> list:
+        """
+        Coarse step of a *top_docs* search across all shards: the closest
+        *top_docs* document centroids per query, whichever shards hold them.
+        A document split over two ``size`` shards counts as two partial ones.
+        Returns, per shard, ``{doc numbers: query rows}`` as in VectorStore.
+        """
+        def nearest(shard):
+            if shard.ntotal == 0:
+                return np.empty((len(queries), 0)), np.empty((len(queries), 0), dtype="int64")
+            return shard._nearest_documents(shard._prepare(queries), top_docs, masks[id(shard)])
+
+        found = list(_pool().map(nearest, shards)) if len(shards) > 1 else [nearest(shards[0])]
+        picked = [{} for _ in shards]  # per shard: query row -> doc numbers
+        for row in range(len(queries)):
+            candidates = [
+                (float(score), s, int(doc))
+                for s, (scores, docs) in enumerate(found)
+                for score, doc in zip(scores[row], docs[row]) if doc != -1
+            ]
+            candidates.sort(key=lambda c: c[0], reverse=self.metric == "cosine")
+            for _, s, doc in candidates[:top_docs]:
+                picked[s].setdefault(row, []).append(doc)
+
+        groups = []
+        for rows in picked:
+            shard_groups: dict = {}
+            for row, docs in rows.items():
+                shard_groups.setdefault(tuple(sorted(docs)), []).append(row)
+            groups.append(shard_groups)
+        return groups
+
+    def search_batch(self, query_vectors, top_k=5, score_threshold=None, filters=None, top_docs=None) -> list:
+        """
+        Same contract as VectorStore.search_batch. Hit ids are global (the
+        shard's offset in manifest order plus its local id) and hits also carry
+        their ``shard``. With *top_docs* the closest documents are picked across
+        all shards first, then only the shards holding them are searched.
+        """
+        queries = np.asarray(query_vectors, dtype="float32")
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        keys = {id(shard): key for key, shard in self.shards.items()}
+        offsets = self._offsets()
+        shards = self._candidate_shards(filters)
+        if not shards:
+            return [[] for _ in range(len(queries))]
+        masks = {id(shard): shard.filter_mask(filters) for shard in shards}
+        groups = self._pick_documents(queries, shards, top_docs, masks) if top_docs else None
+
+        def search_shard(s):
+            shard = shards[s]
+            if groups is None:
+                results = shard._search_masked(shard._prepare(queries), top_k, score_threshold, masks[id(shard)])
+            elif groups[s]:
+                results = shard._search_documents(shard._prepare(queries), groups[s], top_k, score_threshold,
+                                                  masks[id(shard)])
+            else:
+                return [[] for _ in range(len(queries))]
+            for hits in results:
+                for hit in hits:
+                    hit["id"] += offsets[id(shard)]
+                    hit["shard"] = keys[id(shard)]
+            return results
+
+        if len(shards) == 1:
+            per_shard = [search_shard(0)]
+        else:
+            per_shard = list(_pool().map(search_shard, range(len(shards))))
+
+        merged = []
+        for q in range(len(queries)):
+            hits = list({hit["id"]: hit for results in per_shard for hit in results[q]}.values())
+            hits.sort(key=lambda hit: hit["score"], reverse=self.metric == "cosine")
+            merged.append(hits[:top_k])
+        return merged
+
+    def search(self, query_vector, top_k=5, score_threshold=None, filters=None, top_docs=None):
+        hits = self.search_batch(np.asarray([query_vector]), top_k, score_threshold, filters, top_docs)[0]
+        return [hit["metadata"] for hit in hits]
+
+
+def store_exists(path: str) -> bool:
+    return (os.path.isfile(path)
+            or os.path.exists(os.path.join(path, MANIFEST))
+            or os.path.exists(os.path.join(path, "index.faiss")))
+
+
+def load_store(path: str):
+    """
+    Load a snapshot when *path* is a file (see rag.snapshot), a sharded
+    store when it has a shard manifest, else a single VectorStore.
+    """
+    if os.path.isfile(path):
+        from rag.snapshot import load_snapshot
+        return load_snapshot(path)
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        return ShardedVectorStore.load(path)
+    return VectorStore.load(path)
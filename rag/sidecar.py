@@ -0,0 +1,191 @@
+# rag/sidecar.py
+"""
+Local embedding-and-search service.
+
+One process holds the SentenceTransformer and the FAISS index; API workers
+reach it over a Unix socket through ``rag.retriever.SidecarClient``.
+Concurrent queries are coalesced into micro-batches so the model encodes
+them together instead of one at a time.
+
+Wire protocol: one JSON object per line in each direction.
+
+    {"op": "retrieve", "query": "...", "top_k": 5, "score_threshold": null, "filters": null,
+     "top_docs": null}
+        ->  {"ok": true, "chunks": [...]}
+    {"op": "embed", "texts": ["...", ...]}          ->  {"ok": true, "embeddings": [[...], ...]}
+
+Run with:  python -m rag.sidecar --socket /tmp/rag-sidecar.sock
+"""
+import os
+import json
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from rag.settings import (
+    VECTOR_STORE_PATH, SIDECAR_SOCKET, SIDECAR_MAX_BATCH, SIDECAR_MAX_WAIT_MS,
+)
+from rag.embedder import get_embedder
+from rag.vector_store import VectorStore
+from rag.sharded_store import load_store
+from rag.metadata import format_chunk
+
+
+class MicroBatcher:
+    """
+    Collect items submitted from many coroutines and hand them to *fn* in
+    batches of at most *max_batch*, waiting no longer than *max_wait* seconds
+    after the first item of a batch arrives.
+
+    *fn* is a blocking callable taking a list of items and returning a list of
+    results in the same order; it runs on a single worker thread, so items
+    that arrive while a batch is being processed naturally form the next one.
+    """
+
+    def __init__(self, fn, max_batch: int, max_wait: float):
+        self._fn = fn
+        self._max_batch = max(1, max_batch)
+        self._max_wait = max(0.0, max_wait)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sidecar-batch")
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._max_wait
+            while len(batch) < self._max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self._fn, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class SidecarServer:
+    def __init__(self, store: VectorStore, max_batch: int = SIDECAR_MAX_BATCH,
+                 max_wait_ms: float = SIDECAR_MAX_WAIT_MS):
+        self.store = store
+        self.retrieve_batcher = MicroBatcher(self._retrieve_batch, max_batch, max_wait_ms / 1000)
+        self.embed_batcher = MicroBatcher(self._embed_batch, max_batch, max_wait_ms / 1000)
+
+    # ------------------------------------------------------------
+    # Batch workers (run on the batcher thread)
+    # ------------------------------------------------------------
+    def _encode(self, texts: list) -> np.ndarray:
+        # The model the store was built with, as in-process retrieval uses
+        return np.asarray(get_embedder(self.store.model_name).encode(texts, batch_size=len(texts)), dtype="float32")
+
+    def _retrieve_batch(self, items: list) -> list:
+        vectors = self._encode([query for query, _, _, _, _ in items])
+
+        # One FAISS call per distinct filter and document limit in the batch,
+        # trimmed per request afterwards
+        groups: dict = {}
+        for i, (_, _, _, filters, top_docs) in enumerate(items):
+            groups.setdefault((json.dumps(filters, sort_keys=True), top_docs), []).append(i)
+
+        results = [None] * len(items)
+        for positions in groups.values():
+            _, _, _, filters, top_docs = items[positions[0]]
+            top_k = max(items[i][1] for i in positions)
+            hits = self.store.search_batch(vectors[positions], top_k, filters=filters, top_docs=top_docs)
+            for i, query_hits in zip(positions, hits):
+                _, top_k, threshold, _, _ = items[i]
+                query_hits = [hit for hit in query_hits if self.store.meets_threshold(hit["score"], threshold)]
+                results[i] = [format_chunk(hit["metadata"]) for hit in query_hits[:top_k]]
+        return results
+
+    def _embed_batch(self, items: list) -> list:
+        return self._encode(items).tolist()
+
+    # ------------------------------------------------------------
+    # Connection handling
+    # ------------------------------------------------------------
+    async def handle_request(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "retrieve":
+            chunks = await self.retrieve_batcher.submit(
+                (request["query"], int(request.get("top_k", 5)),
+                 request.get("score_threshold"), request.get("filters"), request.get("top_docs"))
+            )
+            return {"ok": True, "chunks": chunks}
+        if op == "embed":
+            embeddings = await asyncio.gather(
+                *(self.embed_batcher.submit(text) for text in request["texts"])
+            )
+            return {"ok": True, "embeddings": list(embeddings)}
+        return {"ok": False, "error": f"unknown op: {op!r}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.handle_request(json.loads(line))
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        print(f"🚀 Sidecar listening on {socket_path}")
+        async with server:
+            await asyncio.gather(
+                server.serve_forever(),
+                self.retrieve_batcher.run(),
+                self.embed_batcher.run(),
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding/search sidecar")
+    parser.add_argument("--socket", default=SIDECAR_SOCKET or "/tmp/rag-sidecar.sock")
+    parser.add_argument("--store", default=VECTOR_STORE_PATH)
+    parser.add_argument("--max-batch", type=int, default=SIDECAR_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=SIDECAR_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    store = load_store(args.store)
+    get_embedder(store.model_name)  # load the store's model before accepting connections
+    server = SidecarServer(store, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
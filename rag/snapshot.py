@@ -0,0 +1,317 @@
+# rag/snapshot.py
+"""
+Single-file, checksummed snapshots of a vector store.
+
+A snapshot holds the FAISS index and the chunk metadata of a VectorStore (or
+of every shard of a ShardedVectorStore) in one file, so a deploy can ship
+and validate the store as one artifact. Layout:
+
+    preamble   magic b"RAGSNAP\\0", format version (u16), flags (u16),
+               header length (u32), SHA-256 of the header (32 bytes)
+    header     JSON: dimension, model name, metric, index type, chunk count,
+               store layout and, per section, its offset, length and SHA-256
+    sections   page-aligned (4096 bytes), so each can be mmapped on its own:
+               the serialized FAISS index and the msgpack-encoded metadata
+
+Files are written to a temporary name, fsynced and renamed into place, so a
+reader never sees a half-written snapshot. ``info`` only reads the header;
+``verify`` checks every section checksum.
+
+    python -m rag.snapshot export vector_store store.ragsnap
+    python -m rag.snapshot verify store.ragsnap
+    python -m rag.snapshot info store.ragsnap
+    python -m rag.snapshot import store.ragsnap vector_store
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+
+import faiss
+import msgspec
+
+from rag.vector_store import VectorStore
+from rag.sharded_store import ShardedVectorStore, load_store
+
+MAGIC = b"RAGSNAP\0"
+VERSION = 1
+ALIGNMENT = 4096
+_PREAMBLE = struct.Struct("<8sHHI32s")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _store_sections(store: VectorStore, prefix: str = "") -> list:
+    return [
+        (prefix + "index", faiss.serialize_index(store.index)),
+        (prefix + "metadata", msgspec.msgpack.encode(store.metadata)),
+    ]
+
+
+def _describe(store) -> tuple:
+    """Header fields and (name, payload) sections for a flat or sharded store."""
+    if isinstance(store, ShardedVectorStore):
+        sections = []
+        shards = []
+        for i, (key, shard) in enumerate(store.shards.items()):
+            sections.extend(_store_sections(shard, f"shard-{i}/"))
+            shards.append({"key": key, "dir": store.dirs[key], "count": shard.ntotal})
+        first = next(iter(store.shards.values()), None)
+        header = {
+            "layout": "sharded",
+            "shard_by": store.shard_by,
+            "max_shard_size": store.max_shard_size,
+            "shards": shards,
+            "index_type": type(first.index).__name__ if first else None,
+        }
+    else:
+        sections = _store_sections(store)
+        header = {"layout": "flat", "index_type": type(store.index).__name__}
+    header.update({
+        "dimension": store.dimension,
+        "model_name": store.model_name,
+        "metric": store.metric,
+        "count": store.ntotal,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    return header, sections
+
+
+def write_snapshot(store, path: str) -> dict:
+    """Write *store* to *path* atomically and return the snapshot header."""
+    header, sections = _describe(store)
+
+    # Section offsets depend on the header length, which depends on the offsets:
+    # lay out with a header budget and grow it until the header fits.
+    budget = ALIGNMENT
+    while True:
+        offset = _aligned(_PREAMBLE.size + budget)
+        header["sections"] = []
+        for name, payload in sections:
+            header["sections"].append({
+                "name": name,
+                "offset": offset,
+                "length": len(payload),
+                "sha256": hashlib.sha256(payload).hexdigest(),
+            })
+            offset = _aligned(offset + len(payload))
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        if len(header_bytes) <= budget:
+            break
+        budget = _aligned(len(header_bytes))
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, VERSION, 0, len(header_bytes), hashlib.sha256(header_bytes).digest()))
+            f.write(header_bytes)
+            for (name, payload), section in zip(sections, header["sections"]):
+                f.write(b"\0" * (section["offset"] - f.tell()))
+                f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+    return header
+
+
+class Snapshot:
+    """A snapshot file mapped into memory; use as a context manager."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"{path}: empty file")
+        self.header = self._read_header()
+        self.sections = {s["name"]: s for s in self.header["sections"]}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _read_header(self) -> dict:
+        if len(self._map) < _PREAMBLE.size:
+            raise SnapshotError(f"{self.path}: too short to be a snapshot")
+        magic, version, _, header_len, header_sha = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path}: not a vector store snapshot")
+        if version > VERSION:
+            raise SnapshotError(f"{self.path}: snapshot version {version} is newer than supported ({VERSION})")
+        header_bytes = self._map[_PREAMBLE.size:_PREAMBLE.size + header_len]
+        if hashlib.sha256(header_bytes).digest() != header_sha:
+            raise SnapshotError(f"{self.path}: header checksum mismatch")
+        header = json.loads(header_bytes)
+        for section in header["sections"]:
+            if section["offset"] + section["length"] > len(self._map):
+                raise SnapshotError(f"{self.path}: section {section['name']} is truncated")
+        return header
+
+    def section(self, name: str) -> memoryview:
+        info = self.sections[name]
+        return memoryview(self._map)[info["offset"]:info["offset"] + info["length"]]
+
+    def _read_index(self, name: str):
+        """Stream the index straight from the mapping (one copy, unlike deserialize_index)."""
+        info = self.sections[name]
+        position = info["offset"]
+        end = info["offset"] + info["length"]
+
+        def read(n: int) -> bytes:
+            nonlocal position
+            chunk = self._map[position:min(position + n, end)]
+            position += len(chunk)
+            return chunk
+
+        reader = faiss.PyCallbackIOReader(read, 1 << 24)
+        try:
+            return faiss.read_index(reader)
+        finally:
+            del reader
+
+    def verify(self) -> list:
+        """Names of the sections whose checksum does not match."""
+        bad = []
+        for name, info in self.sections.items():
+            view = self.section(name)
+            try:
+                if hashlib.sha256(view).hexdigest() != info["sha256"]:
+                    bad.append(name)
+            finally:
+                view.release()
+        return bad
+
+    def _load_store(self, prefix: str = "") -> VectorStore:
+        store = VectorStore(0, metric=self.header["metric"], model_name=self.header["model_name"])
+        store.index = self._read_index(prefix + "index")
+        view = self.section(prefix + "metadata")
+        try:
+            store.metadata = msgspec.msgpack.decode(view)
+        finally:
+            view.release()
+        return store
+
+    def load(self, verify: bool = True):
+        """Rebuild the VectorStore or ShardedVectorStore held by the snapshot."""
+        if verify:
+            bad = self.verify()
+            if bad:
+                raise SnapshotError(f"{self.path}: checksum mismatch in {', '.join(bad)}")
+        header = self.header
+        if header["layout"] == "flat":
+            return self._load_store()
+        store = ShardedVectorStore(
+            header["dimension"], header["shard_by"], header["max_shard_size"],
+            header["metric"], header["model_name"],
+        )
+        for i, entry in enumerate(header["shards"]):
+            store.shards[entry["key"]] = self._load_store(f"shard-{i}/")
+            store.dirs[entry["key"]] = entry["dir"]
+            store._dirty.add(entry["key"])
+        return store
+
+
+def load_snapshot(path: str, verify: bool = True):
+    with Snapshot(path) as snapshot:
+        return snapshot.load(verify)
+
+
+# ------------------------------------------------------------
+# Command line
+# ------------------------------------------------------------
+def _export(args):
+    start = time.perf_counter()
+    store = load_store(args.store)
+    header = write_snapshot(store, args.snapshot)
+    size = os.path.getsize(args.snapshot)
+    print(f"📦 Exported {header['count']} vectors to {args.snapshot} "
+          f"({size / 2**20:.1f} MiB) in {time.perf_counter() - start:.2f}s")
+
+
+def _import(args):
+    start = time.perf_counter()
+    store = load_snapshot(args.snapshot, verify=not args.no_verify)
+    store.save(args.store)
+    print(f"📥 Imported {store.ntotal} vectors into {args.store} in {time.perf_counter() - start:.2f}s")
+
+
+def _verify(args) -> int:
+    start = time.perf_counter()
+    try:
+        with Snapshot(args.snapshot) as snapshot:
+            bad = snapshot.verify()
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        return 1
+    if bad:
+        print(f"❌ Checksum mismatch in {', '.join(bad)}")
+        return 1
+    print(f"✅ {args.snapshot} is intact ({time.perf_counter() - start:.2f}s)")
+    return 0
+
+
+def _info(args):
+    with Snapshot(args.snapshot) as snapshot:
+        header = dict(snapshot.header)
+    print(json.dumps(header, ensure_ascii=False, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, import and check vector store snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="write a store directory to a snapshot file")
+    export_parser.add_argument("store")
+    export_parser.add_argument("snapshot")
+
+    import_parser = sub.add_parser("import", help="unpack a snapshot into a store directory")
+    import_parser.add_argument("snapshot")
+    import_parser.add_argument("store")
+    import_parser.add_argument("--no-verify", action="store_true", help="skip the checksum check")
+
+    verify_parser = sub.add_parser("verify", help="check every section checksum")
+    verify_parser.add_argument("snapshot")
+
+    info_parser = sub.add_parser("info", help="print the snapshot header")
+    info_parser.add_argument("snapshot")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        _export(args)
+    elif args.command == "import":
+        _import(args)
+    elif args.command == "verify":
+        sys.exit(_verify(args))
+    else:
+        _info(args)
+
+
+if __name__ == "__main__":
+    main()
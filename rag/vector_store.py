@@ -1,37 +1,355 @@
 # rag/vector_store.py
 import os
+import json
 import faiss
 import pickle
 import numpy as np
 
+# Metadata fields that search filters can match on, besides the date range
+FILTER_FIELDS = ("source", "doc_type", "article")
+
+REDUCTIONS = {"pca", "opq"}
+# Vectors sampled to fit a reduction. OPQ trains 256 centroids per sub-vector
+# in every iteration, so it gets a smaller sample (about 40 points per centroid)
+_REDUCTION_TRAIN_MAX = {"pca": 65536, "opq": 10240}
+_OPQ_MIN_VECTORS = 256
+
+
+def fit_reduction(vectors: np.ndarray, dimension: int, method: str = "pca", metric: str = "l2"):
+    """
+    An empty FAISS index that projects vectors to *dimension* with a PCA or
+    OPQ transform fitted on *vectors*, and searches them exactly there.
+    """
+    if method not in REDUCTIONS:
+        raise ValueError(f"Unknown reduction: {method!r}")
+    n, d = vectors.shape
+    if not 0 < dimension < d:
+        raise ValueError(f"Reduced dimension must be between 1 and {d - 1}, got {dimension}")
+    if n < max(dimension, _OPQ_MIN_VECTORS if method == "opq" else 0):
+        raise ValueError(f"Too few vectors ({n}) to fit a {method} reduction to {dimension} dimensions")
+
+    if n > _REDUCTION_TRAIN_MAX[method]:
+        vectors = vectors[np.random.default_rng(0).choice(n, _REDUCTION_TRAIN_MAX[method], replace=False)]
+    if method == "pca":
+        transform = faiss.PCAMatrix(d, dimension)
+        if metric == "cosine":
+            # PCA centres the data, which distorts inner products. Fitting on the
+            # vectors and their negations gives the same axes around the origin
+            # and a zero mean, so the projection keeps inner products.
+            vectors = np.vstack([vectors, -vectors])
+    else:
+        # OPQ needs the output split into equal sub-vectors
+        transform = faiss.OPQMatrix(d, dimension // 4 if dimension % 4 == 0 else dimension, dimension)
+    transform.train(np.ascontiguousarray(vectors, dtype="float32"))
+    inner = faiss.IndexFlatIP(dimension) if metric == "cosine" else faiss.IndexFlatL2(dimension)
+    return faiss.IndexPreTransform(transform, inner)
+
+
 class VectorStore:
-    def __init__(self, dimension: int, db_path="vector_store"):
+    """
+    FAISS index plus one metadata dict per vector.
+
+    ``metric="l2"`` ranks by squared Euclidean distance (lower is closer).
+    ``metric="cosine"`` L2-normalizes every stored and query vector and ranks
+    by inner product, so scores are cosine similarities (higher is closer).
+
+    ``model_name`` records which embedding model produced the vectors so
+    queries are embedded with the same one; None means the configured default.
+
+    Searches can be restricted with *filters*, e.g.
+    ``{"source": [...], "doc_type": "decree", "article": 12,
+    "date_from": "2023-01-01", "date_to": "2023-12-31"}``. Values of one
+    field are OR-ed, fields are AND-ed. The matching ids are handed to FAISS
+    as a bitmap selector, so only the selected vectors are scanned.
+
+    ``reduce()`` projects the stored vectors, and every vector added or
+    searched afterwards, to fewer dimensions with a PCA or OPQ transform
+    fitted on the corpus (a FAISS ``IndexPreTransform``, saved with the
+    index). Scores are then computed in the reduced space and approximate
+    the full-width ones.
+
+    With *top_docs*, search is coarse-to-fine: the query is first matched
+    against one centroid per document (the mean of its chunk vectors, by
+    ``source``), and only the chunks of the *top_docs* closest documents are
+    scored. Centroids are saved next to the index and rebuilt after ``add``.
+    """
+
+    def __init__(self, dimension: int, db_path="vector_store", metric: str = "l2",
+                 model_name: str | None = None):
+        if metric not in {"l2", "cosine"}:
+            raise ValueError(f"Unknown metric: {metric!r}")
         self.db_path = db_path
-        self.index = faiss.IndexFlatL2(dimension)
+        self.metric = metric
+        self.model_name = model_name
+        self.index = faiss.IndexFlatIP(dimension) if metric == "cosine" else faiss.IndexFlatL2(dimension)
         self.metadata = []
+        self._bitsets = {}
+        self._dates = None
+        self._centroids = None  # (document ids per centroid, centroid index)
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def dimension(self) -> int:
+        """Dimension of the vectors added and searched (before any reduction)."""
+        return self.index.d
+
+    @property
+    def reduced(self) -> bool:
+        return isinstance(self.index, faiss.IndexPreTransform)
+
+    @property
+    def stored_dimension(self) -> int:
+        return self.index.index.d if self.reduced else self.index.d
+
+    def _prepare(self, vectors) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if self.metric == "cosine":
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        return vectors
 
     def add(self, vectors, metadata):
-        self.index.add(np.array(vectors).astype("float32"))
+        self.index.add(self._prepare(vectors))
         self.metadata.extend(metadata)
+        self._bitsets.clear()
+        self._dates = None
+        self._centroids = None
+
+    def reduce(self, dimension: int, method: str = "pca"):
+        """Fit a *method* ("pca" or "opq") reduction to *dimension* on the stored vectors and apply it."""
+        if self.reduced:
+            raise ValueError("Store is already reduced")
+        self.apply_reduction(fit_reduction(self.index.reconstruct_n(0, self.ntotal), dimension, method, self.metric))
+
+    def apply_reduction(self, template):
+        """Re-index the stored vectors with a copy of *template*, an index from fit_reduction()."""
+        vectors = self.index.reconstruct_n(0, self.ntotal)
+        index = faiss.clone_index(template)
+        index.reset()
+        index.add(vectors)
+        self.index = index
+        self._centroids = None
 
     def save(self, path):
         os.makedirs(path, exist_ok=True)
         faiss.write_index(self.index, os.path.join(path, "index.faiss"))
         with open(os.path.join(path, "metadata.pkl"), "wb") as f:
             pickle.dump(self.metadata, f)
+        with open(os.path.join(path, "store.json"), "w", encoding="utf-8") as f:
+            json.dump({"model_name": self.model_name, "metric": self.metric}, f)
+        if self.ntotal:
+            self._save_centroids(path)
 
     @staticmethod
     def load(path):
         store = VectorStore(0)  # Dummy init
         store.index = faiss.read_index(os.path.join(path, "index.faiss"))
+        if store.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            store.metric = "cosine"
         with open(os.path.join(path, "metadata.pkl"), "rb") as f:
             store.metadata = pickle.load(f)
+        info_path = os.path.join(path, "store.json")
+        if os.path.exists(info_path):
+            with open(info_path, encoding="utf-8") as f:
+                store.model_name = json.load(f).get("model_name")
+        store._load_centroids(path)
         return store
-    def search(self, query_vector, top_k=5):
-        distances, indices = self.index.search(np.array([query_vector]).astype("float32"), top_k)
-        results = []
-        for idx in indices[0]:
-            if idx == -1:
+
+    def meets_threshold(self, score: float, score_threshold=None) -> bool:
+        if score_threshold is None:
+            return True
+        if self.metric == "cosine":
+            return score >= score_threshold
+        return score <= score_threshold
+
+    # ------------------------------------------------------------
+    # Filtering
+    # ------------------------------------------------------------
+    def _field_bitsets(self, field: str) -> dict:
+        """One boolean mask over all ids per value of *field*, built in a single pass."""
+        if field not in self._bitsets:
+            ids_by_value: dict = {}
+            for i, meta in enumerate(self.metadata):
+                values = (meta.get("articles") or [meta.get("article")]) if field == "article" else [meta.get(field)]
+                for value in values:
+                    if value is not None:
+                        ids_by_value.setdefault(value, []).append(i)
+            bitsets = {}
+            for value, ids in ids_by_value.items():
+                mask = np.zeros(len(self.metadata), dtype=bool)
+                mask[ids] = True
+                bitsets[value] = mask
+            self._bitsets[field] = bitsets
+        return self._bitsets[field]
+
+    def _date_array(self) -> np.ndarray:
+        if self._dates is None:
+            self._dates = np.array([meta.get("date") or "" for meta in self.metadata], dtype="U10")
+        return self._dates
+
+    def filter_mask(self, filters: dict | None) -> np.ndarray | None:
+        """Boolean mask of the ids matching *filters*, or None for no filtering."""
+        if not filters:
+            return None
+        unknown = set(filters) - set(FILTER_FIELDS) - {"date_from", "date_to"}
+        if unknown:
+            raise ValueError(f"Unknown filter fields: {sorted(unknown)}")
+
+        mask = np.ones(len(self.metadata), dtype=bool)
+        for field in FILTER_FIELDS:
+            wanted = filters.get(field)
+            if wanted is None:
                 continue
-            results.append(self.metadata[idx])
-        return results
\ No newline at end of file
+            bitsets = self._field_bitsets(field)
+            field_mask = np.zeros(len(self.metadata), dtype=bool)
+            for value in wanted if isinstance(wanted, (list, tuple, set)) else [wanted]:
+                if value in bitsets:
+                    field_mask |= bitsets[value]
+            mask &= field_mask
+
+        if filters.get("date_from") or filters.get("date_to"):
+            dates = self._date_array()
+            mask &= dates != ""
+            if filters.get("date_from"):
+                mask &= dates >= filters["date_from"]
+            if filters.get("date_to"):
+                mask &= dates <= filters["date_to"]
+        return mask
+
+    # ------------------------------------------------------------
+    # Document centroids
+    # ------------------------------------------------------------
+    def _document_ids(self) -> dict:
+        """Ids of each document's chunks, by source ("" for chunks without one)."""
+        ids_by_source: dict = {}
+        for i, meta in enumerate(self.metadata):
+            ids_by_source.setdefault(meta.get("source") or "", []).append(i)
+        return {source: np.array(ids, dtype="int64") for source, ids in ids_by_source.items()}
+
+    def _centroid_index(self, centroids: np.ndarray):
+        index = faiss.IndexFlatIP(self.dimension) if self.metric == "cosine" else faiss.IndexFlatL2(self.dimension)
+        index.add(self._prepare(centroids))
+        return index
+
+    def _ensure_centroids(self) -> tuple:
+        if self._centroids is None:
+            documents = self._document_ids()
+            vectors = self.index.reconstruct_n(0, self.ntotal)
+            centroids = np.stack([vectors[ids].mean(axis=0) for ids in documents.values()])
+            self._centroids = (list(documents.values()), self._centroid_index(centroids))
+        return self._centroids
+
+    def _save_centroids(self, path):
+        doc_ids, index = self._ensure_centroids()
+        np.save(os.path.join(path, "centroids.npy"), index.reconstruct_n(0, index.ntotal))
+        with open(os.path.join(path, "centroids.json"), "w", encoding="utf-8") as f:
+            json.dump({"count": self.ntotal, "sources": list(self._document_ids())}, f, ensure_ascii=False)
+
+    def _load_centroids(self, path):
+        """Reuse saved centroids when they match the index; otherwise they are rebuilt on first use."""
+        info_path = os.path.join(path, "centroids.json")
+        if not os.path.exists(info_path):
+            return
+        with open(info_path, encoding="utf-8") as f:
+            info = json.load(f)
+        documents = self._document_ids()
+        if info["count"] != self.ntotal or info["sources"] != list(documents):
+            return
+        centroids = np.load(os.path.join(path, "centroids.npy"))
+        self._centroids = (list(documents.values()), self._centroid_index(centroids))
+
+    def _nearest_documents(self, queries: np.ndarray, top_docs: int, mask: np.ndarray | None) -> tuple:
+        """
+        ``(scores, doc numbers)`` of the *top_docs* closest document centroids
+        per query row, -1 padded. With a filter *mask*, only documents holding
+        a matching chunk can be picked.
+        """
+        doc_ids, index = self._ensure_centroids()
+        params = None
+        candidates = len(doc_ids)
+        if mask is not None:
+            allowed = np.array([mask[ids].any() for ids in doc_ids])
+            candidates = int(allowed.sum())
+            bitmap = np.packbits(allowed, bitorder="little")
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap)))
+        if candidates == 0:
+            return np.empty((len(queries), 0), dtype="float32"), np.empty((len(queries), 0), dtype="int64")
+        return index.search(queries, min(top_docs, candidates), params=params)
+
+    def _select_documents(self, queries: np.ndarray, top_docs: int, mask: np.ndarray | None) -> dict:
+        """Group query rows by the documents picked for them: ``{doc numbers: rows}``."""
+        _, doc_rows = self._nearest_documents(queries, top_docs, mask)
+        groups: dict = {}
+        for row, docs in enumerate(doc_rows):
+            groups.setdefault(tuple(sorted(int(d) for d in docs if d != -1)), []).append(row)
+        return groups
+
+    def _search_documents(self, queries: np.ndarray, groups: dict, top_k: int, score_threshold,
+                          mask: np.ndarray | None) -> list:
+        """Search each group of query rows within its documents (see _select_documents)."""
+        doc_ids = self._ensure_centroids()[0]
+        results = [[] for _ in range(len(queries))]
+        for docs, rows in groups.items():
+            doc_mask = np.zeros(self.ntotal, dtype=bool)
+            for doc in docs:
+                doc_mask[doc_ids[doc]] = True
+            if mask is not None:
+                doc_mask &= mask
+            for row, hits in zip(rows, self._search_masked(queries[rows], top_k, score_threshold, doc_mask)):
+                results[row] = hits
+        return results
+
+    # ------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------
+    def search_batch(self, query_vectors, top_k=5, score_threshold=None, filters=None, top_docs=None) -> list:
+        """
+        Search an ``(n, dim)`` query matrix in a single FAISS call.
+
+        Returns one list per query of ``{"id", "score", "metadata"}`` hits,
+        best first. ``score`` is the squared L2 distance for l2 stores and the
+        cosine similarity for cosine stores; *score_threshold* drops hits
+        further than that distance (l2) or less similar than that (cosine).
+        *filters* restricts the search to matching chunks and *top_docs*
+        to the chunks of the closest documents (see the class docstring).
+        """
+        queries = self._prepare(query_vectors)
+        mask = self.filter_mask(filters)
+        if not top_docs or self.ntotal == 0:
+            return self._search_masked(queries, top_k, score_threshold, mask)
+
+        groups = self._select_documents(queries, top_docs, mask)
+        return self._search_documents(queries, groups, top_k, score_threshold, mask)
+
+    def _search_masked(self, queries: np.ndarray, top_k: int, score_threshold, mask: np.ndarray | None) -> list:
+        candidates = self.index.ntotal
+        params = None
+        if mask is not None:
+            candidates = int(mask.sum())
+            bitmap = np.packbits(mask, bitorder="little")
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap)))
+        if candidates == 0 or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        scores, indices = self.index.search(queries, min(top_k, candidates), params=params)
+
+        results = []
+        for row_scores, row_ids in zip(scores, indices):
+            hits = []
+            for score, idx in zip(row_scores, row_ids):
+                if idx == -1:
+                    continue
+                if not self.meets_threshold(score, score_threshold):
+                    continue
+                hits.append({"id": int(idx), "score": float(score), "metadata": self.metadata[idx]})
+            results.append(hits)
+        return results
+
+    def search(self, query_vector, top_k=5, score_threshold=None, filters=None, top_docs=None):
+        hits = self.search_batch(np.asarray([query_vector]), top_k, score_threshold, filters, top_docs)[0]
+        return [hit["metadata"] for hit in hits]